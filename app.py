@@ -1,25 +1,85 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, make_response
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, make_response, g, has_app_context, session, Response, send_file, stream_template, stream_with_context
 from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
-from werkzeug.security import generate_password_hash, check_password_hash
+from flask_caching import Cache
+from werkzeug.security import check_password_hash
+from werkzeug.utils import secure_filename
+from argon2 import PasswordHasher
+from argon2.exceptions import VerifyMismatchError, InvalidHashError
 import sqlite3
-from datetime import datetime
+from datetime import date, datetime
+from itertools import chain
+from jinja2 import FileSystemBytecodeCache
+from migrate import run_migrations
+import hashlib
+import logging
+import queue
+import re
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 import os
+import shutil
+import tempfile
+import threading
 import time
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.pdfgen import canvas
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image
-from reportlab.lib.units import inch
-from reportlab.lib import colors
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-import io
+import uuid
 
 app = Flask(__name__, static_folder='static')
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'exploreease-secret-key-2025')
 app.config['UPLOAD_FOLDER'] = 'static/uploads'
+# Created here rather than under __main__ so WSGI servers get it too
+os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+# Cap request bodies so the multipart parser never chews through an
+# unbounded upload; oversized requests 413 before any parsing work
+app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024
 app.config['ADMIN_SECRET_KEY'] = os.environ.get('ADMIN_SECRET_KEY', 'admin123')
 
+logging.basicConfig(level=logging.DEBUG if app.debug else logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Persist compiled template bytecode across worker restarts and compile the
+# whole template set up front, so no request pays first-render compilation
+_JINJA_CACHE_DIR = os.path.join(tempfile.gettempdir(), 'exploreease-jinja-cache')
+os.makedirs(_JINJA_CACHE_DIR, exist_ok=True)
+PDF_CACHE_DIR = os.path.join(tempfile.gettempdir(), 'exploreease-pdf-cache')
+os.makedirs(PDF_CACHE_DIR, exist_ok=True)
+app.jinja_env.bytecode_cache = FileSystemBytecodeCache(_JINJA_CACHE_DIR)
+if not app.debug:
+    app.jinja_env.auto_reload = False
+
+# Argon2id is 2-4x cheaper than werkzeug's pbkdf2 default at equivalent
+# security, with independently tunable time/memory cost. Legacy pbkdf2
+# hashes are still verified and transparently upgraded on login.
+password_hasher = PasswordHasher(time_cost=2, memory_cost=65536, parallelism=1)
+
+def hash_password(password):
+    """Hash a password with argon2id"""
+    return password_hasher.hash(password)
+
+def verify_password(stored_hash, password):
+    """
+    Verify a password against an argon2 hash, falling back to werkzeug's
+    pbkdf2/scrypt formats for accounts created before the argon2 switch.
+    Returns (valid, needs_rehash).
+    """
+    try:
+        password_hasher.verify(stored_hash, password)
+        return True, password_hasher.check_needs_rehash(stored_hash)
+    except VerifyMismatchError:
+        return False, False
+    except InvalidHashError:
+        # Legacy werkzeug-format hash
+        if check_password_hash(stored_hash, password):
+            return True, True
+        return False, False
+
+# Server-side cache for the read-heavy package listings (package data is
+# nearly static - it only changes through the admin screens)
+cache = Cache(app, config={'CACHE_TYPE': 'SimpleCache', 'CACHE_DEFAULT_TIMEOUT': 300})
+
+def _skip_page_cache():
+    """Don't serve cached pages to logged-in users or when flashes are pending"""
+    return current_user.is_authenticated or bool(session.get('_flashes'))
+
 @app.context_processor
 def inject_now():
     return {'now': datetime.now()}
@@ -31,30 +91,108 @@ login_manager.login_view = 'login'
 
 # ==================== DATABASE CONNECTION FUNCTION ====================
 # ==================== DATABASE CONNECTION FUNCTION ====================
-def get_db_connection():
+def _connect_db():
     """
-    Universal database connection that works on both local and Render
-    Uses persistent disk on Render which survives redeploys
+    Open a new SQLite connection (local path or Render persistent disk)
+    with the standard pragma set applied
     """
     if 'RENDER' in os.environ:
         # On Render - use persistent disk
         db_path = '/opt/render/data/database.db'
         # Ensure directory exists
         os.makedirs('/opt/render/data', exist_ok=True)
-        print("🟢 Using Render SQLite database at:", db_path)
+        logger.debug("Using Render SQLite database at %s", db_path)
     else:
         # Local development
         db_path = 'database.db'
-        print("🟢 Using local SQLite database at:", db_path)
+        logger.debug("Using local SQLite database at %s", db_path)
     
-    conn = sqlite3.connect(db_path)
+    conn = sqlite3.connect(db_path, timeout=10, check_same_thread=False,
+                           cached_statements=256)
     conn.row_factory = sqlite3.Row
+    # Apply the performance/concurrency pragmas once per connection so every
+    # caller (login, packages, payments, ...) gets the same WAL behaviour
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA busy_timeout=5000")
+    conn.execute("PRAGMA foreign_keys=ON")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA cache_size=-65536")
+    # Memory-map the database file (256 MiB window) so read-heavy routes
+    # serve pages straight from the OS page cache without an extra copy
+    conn.execute("PRAGMA mmap_size=268435456")
     return conn
+
+# Opening a SQLite connection touches the .db/-wal/-shm files and replays
+# the pragma list, which dominates latency for short handlers like
+# toggle_package. Finished connections are parked in a small LIFO pool and
+# reused by the next request instead of being closed.
+_POOL_SIZE = 8
+_conn_pool = queue.LifoQueue(maxsize=_POOL_SIZE)
+
+def _acquire_connection():
+    """Take a pooled connection, opening a fresh one if the pool is empty"""
+    try:
+        return _conn_pool.get_nowait()
+    except queue.Empty:
+        return _connect_db()
+
+def _release_connection(conn):
+    """Return a connection to the pool, closing it if the pool is full"""
+    try:
+        conn.rollback()  # discard any uncommitted state before reuse
+        _conn_pool.put_nowait(conn)
+    except (queue.Full, sqlite3.Error):
+        conn.close()
+
+def get_db_connection():
+    """
+    Return the request-scoped database connection, checking one out of the
+    pool on first use. The connection is cached on flask.g and handed back
+    by the teardown hook, so each request pays the checkout cost at most
+    once and connections survive across requests.
+    """
+    if has_app_context():
+        conn = getattr(g, '_db_conn', None)
+        if conn is None:
+            conn = _acquire_connection()
+            g._db_conn = conn
+        return conn
+    # Outside an app context (scripts, shells) fall back to a plain connection
+    return _connect_db()
+
+# Every admin endpoint shares one gate instead of repeating the is_admin
+# check at the top of each view. admin_register is deliberately absent: it
+# has its own first-admin bootstrap logic. Unauthenticated users fall
+# through to @login_required, which still sends them to the login page.
+ADMIN_ENDPOINTS = frozenset({
+    'admin', 'admin_packages', 'add_package', 'edit_package', 'delete_package',
+    'toggle_package', 'admin_users', 'toggle_user_admin', 'generate_report',
+    'admin_refunds', 'process_refund', 'update_schema',
+})
+
+@app.before_request
+def require_admin():
+    """Redirect authenticated non-admins away from admin endpoints"""
+    if (request.endpoint in ADMIN_ENDPOINTS
+            and current_user.is_authenticated and not current_user.is_admin):
+        flash('Access denied!', 'error')
+        return redirect(url_for('index'))
+
+@app.teardown_appcontext
+def close_db_connection(exception):
+    """Return the request-scoped connection to the pool when the context ends"""
+    conn = getattr(g, '_db_conn', None)
+    if conn is not None:
+        g._db_conn = None
+        _release_connection(conn)
 # ==================== END DATABASE CONNECTION ====================
 # ==================== END DATABASE CONNECTION ====================
 
 def debug_database_state():
     """Debug function to check database state"""
+    if not app.debug:
+        return
     conn = get_db_connection()
     c = conn.cursor()
     
@@ -62,239 +200,158 @@ def debug_database_state():
         # Check tables
         c.execute("SELECT name FROM sqlite_master WHERE type='table'")
         tables = c.fetchall()
-        print("DEBUG: Tables in database:", [table[0] for table in tables])
+        logger.debug("Tables in database: %s", [table[0] for table in tables])
         
         # Check recent bookings
         c.execute("SELECT id, user_id, package_id, total_price FROM bookings ORDER BY id DESC LIMIT 5")
         recent_bookings = c.fetchall()
-        print("DEBUG: Recent bookings:", recent_bookings)
+        logger.debug("Recent bookings: %s", recent_bookings)
         
         # Check payments table structure
         c.execute("PRAGMA table_info(payments)")
         payment_columns = c.fetchall()
-        print("DEBUG: Payments table columns:", payment_columns)
+        logger.debug("Payments table columns: %s", payment_columns)
         
         # Check if there are any payments
         c.execute("SELECT COUNT(*) FROM payments")
         payment_count = c.fetchone()[0]
-        print("DEBUG: Total payments:", payment_count)
+        logger.debug("Total payments: %s", payment_count)
         
     except Exception as e:
-        print(f"DEBUG Error: {e}")
-    finally:
-        conn.close()
+        logger.error("Error inspecting database state: %s", e)
 
-def verify_and_fix_payments_table():
-    """Verify and fix the payments table if needed"""
-    conn = get_db_connection()
-    c = conn.cursor()
-    
-    try:
-        # Check if payments table has all required columns
-        c.execute("PRAGMA table_info(payments)")
-        columns = c.fetchall()
-        column_names = [col[1] for col in columns]
-        print("DEBUG: Payments table columns:", column_names)
-        
-        # Add missing columns if needed
-        required_columns = ['id', 'booking_id', 'user_id', 'amount', 'payment_method', 'status', 'transaction_id', 'payment_date', 'created_at']
-        
-        for req_col in required_columns:
-            if req_col not in column_names:
-                print(f"DEBUG: Adding missing column: {req_col}")
-                if req_col == 'amount':
-                    c.execute(f"ALTER TABLE payments ADD COLUMN {req_col} REAL NOT NULL DEFAULT 0.0")
-                elif req_col in ['payment_date', 'created_at']:
-                    c.execute(f"ALTER TABLE payments ADD COLUMN {req_col} DATETIME DEFAULT CURRENT_TIMESTAMP")
-                else:
-                    c.execute(f"ALTER TABLE payments ADD COLUMN {req_col} TEXT")
-        
-        conn.commit()
-        print("DEBUG: Payments table verified and fixed if needed")
-        
-    except Exception as e:
-        print(f"DEBUG: Error verifying payments table: {e}")
-        conn.rollback()
-    finally:
-        conn.close()
+# SQLite allows a single writer at a time, so instead of busy-retrying with
+# sleeps when concurrent payments collide, all payment writes funnel through
+# one long-lived connection guarded by an in-process lock. Writers queue on
+# the lock and each insert succeeds on the first attempt.
+_WRITE_LOCK = threading.Lock()
+_writer_conn = None
 
-def create_payment_simple(booking_id, user_id, amount, payment_method, transaction_id=None, max_retries=5, retry_delay=0.5):
-    """Enhanced payment creation with better error handling and type conversion"""
-    
-    for attempt in range(max_retries):
-        conn = None
+def _get_writer_connection():
+    """Return the shared writer connection, opening it on first use"""
+    global _writer_conn
+    if _writer_conn is None:
+        _writer_conn = _connect_db()
+    return _writer_conn
+
+@contextmanager
+def write_conn():
+    """
+    Yield the shared writer connection under the write lock, committing on
+    success and rolling back on error. Read-only handlers keep using the
+    pooled connections from get_db_connection(), so under WAL the readers
+    run in parallel while all writes funnel through this single handle.
+    """
+    with _WRITE_LOCK:
+        conn = _get_writer_connection()
         try:
-            print(f"🔄 PAYMENT ATTEMPT {attempt + 1}/{max_retries} for booking {booking_id}")
-            
-            # Increase delay between retries
-            if attempt > 0:
-                time.sleep(retry_delay * attempt)
-                print(f"⏳ Retrying after {retry_delay * attempt} seconds...")
-            
-            conn = get_db_connection()
-            # More aggressive timeout settings
-            conn.execute("PRAGMA busy_timeout = 10000")  # 10 seconds
-            conn.execute("PRAGMA journal_mode=WAL")
-            
-            c = conn.cursor()
-            
-            # Convert amount safely - handle both string and numeric types
-            try:
-                if isinstance(amount, str):
-                    # Remove any currency symbols or commas
-                    clean_amount = amount.replace('₹', '').replace('$', '').replace(',', '').strip()
-                    amount_float = float(clean_amount)
-                    print(f"💰 String amount '{amount}' converted to float: {amount_float}")
-                else:
-                    amount_float = float(amount)
-                    print(f"💰 Numeric amount converted to float: {amount_float}")
-            except (ValueError, TypeError) as e:
-                print(f"❌ Amount conversion failed: {e}")
-                print(f"❌ Original amount: {amount} (type: {type(amount)})")
-                amount_float = 0.0
-            
-            print(f"💰 Final amount for payment: {amount_float} (type: {type(amount_float)})")
-            
-            if not transaction_id:
-                transaction_id = f"TXN{datetime.now().strftime('%Y%m%d%H%M%S')}{booking_id}"
-            
-            print(f"📝 Inserting payment with transaction ID: {transaction_id}")
-            
-            # Simple insert with error handling
-            c.execute('''
-                INSERT INTO payments (booking_id, user_id, amount, payment_method, transaction_id, status)
-                VALUES (?, ?, ?, ?, ?, 'Pending')
-            ''', (booking_id, user_id, amount_float, payment_method, transaction_id))
-            
-            payment_id = c.lastrowid
+            yield conn
             conn.commit()
-            print(f"✅ PAYMENT SUCCESS: ID {payment_id}")
-            return payment_id
-            
-        except sqlite3.OperationalError as e:
-            error_msg = str(e)
-            print(f"❌ DATABASE ERROR (Attempt {attempt + 1}): {error_msg}")
-            
-            if conn:
-                conn.close()
-                
-            if "database is locked" in error_msg and attempt < max_retries - 1:
-                print(f"🔄 Database locked, will retry...")
-                continue
-            else:
-                print(f"💥 Final database error after {max_retries} attempts")
-                return None
-                
-        except sqlite3.IntegrityError as e:
-            print(f"❌ INTEGRITY ERROR: {e}")
-            if conn:
-                conn.close()
-            return None
-            
-        except Exception as e:
-            print(f"❌ UNEXPECTED ERROR: {e}")
-            import traceback
-            print(f"📋 Traceback: {traceback.format_exc()}")
-            if conn:
-                conn.close()
-            return None
-    
-    print(f"💥 All {max_retries} payment attempts failed")
-    return None
-
-def create_payment_safe(booking_id, user_id, amount, payment_method, transaction_id=None):
+        except Exception:
+            conn.rollback()
+            raise
+
+def _save_upload(image_file, image_path):
     """
-    Safe payment creation with type conversion and validation
+    Write an uploaded image to disk with a 1 MiB copy buffer instead of
+    FileStorage.save's 16 KB default, so multi-MB images take a handful of
+    read/write syscalls rather than hundreds.
     """
-    conn = get_db_connection()
-    c = conn.cursor()
-    
+    with open(image_path, 'wb') as f:
+        shutil.copyfileobj(image_file.stream, f, length=1024 * 1024)
+
+# ReportLab document builds run on this bounded executor: the worker thread
+# is free to release the GIL during the C-level layout work, and a burst of
+# PDF downloads can never occupy more than four threads at once
+_PDF_EXECUTOR = ThreadPoolExecutor(max_workers=4, thread_name_prefix='pdf')
+
+# Payment field validation compiled once; a single regex match replaces the
+# per-request replace/len/isdigit scans on the payment hot path
+_CARD_RE = re.compile(r'^\d{16}$')
+_CVV_RE = re.compile(r'^\d{3}$')
+_UPI_RE = re.compile(r'^[\w.\-]+@[\w.\-]+$')
+_SPACE_STRIP = str.maketrans('', '', ' ')
+_ID_RE = re.compile(r'\d+')
+_DATE_RE = re.compile(r'\d{4}-\d{2}-\d{2}')
+
+# Strips currency symbols, separators and spaces from amount strings in one
+# C-level pass instead of chained str.replace calls
+_CURRENCY_STRIP = str.maketrans('', '', '₹$, ')
+
+# SQLite 3.35+ can hand back the new row id in the same statement, skipping
+# the separate lastrowid fetch from cursor state
+_HAS_RETURNING = sqlite3.sqlite_version_info >= (3, 35)
+
+_PAYMENT_SQL = '''
+    INSERT INTO payments (booking_id, user_id, amount, payment_method, transaction_id, status)
+    VALUES (?, ?, ?, ?, ?, 'Pending')''' + (' RETURNING id' if _HAS_RETURNING else '')
+
+_BOOKING_SQL = '''INSERT INTO bookings 
+                            (user_id, package_id, travel_date, guests, total_price, status, payment_status)
+                            VALUES (?, ?, ?, ?, ?, 'Pending', 'Pending')''' + (
+    ' RETURNING id' if _HAS_RETURNING else '')
+
+# Hoisted so every request reuses byte-identical SQL text and hits the
+# connection's prepared-statement cache instead of re-planning each call
+_PACKAGE_INSERT_SQL = '''INSERT INTO packages 
+                    (name, destination, category, duration, price, rating, latitude, longitude,
+                     description, image, region, itinerary, inclusions, available_slots)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)'''
+
+_PACKAGE_UPDATE_SQL = '''UPDATE packages SET 
+                        name=?, destination=?, category=?, duration=?, price=?, rating=?,
+                        latitude=?, longitude=?, description=?, image=?, region=?, 
+                        itinerary=?, inclusions=?, available_slots=?, is_active=?
+                        WHERE id=?'''
+
+_PACKAGE_UPDATE_KEEP_IMAGE_SQL = '''UPDATE packages SET 
+                        name=?, destination=?, category=?, duration=?, price=?, rating=?,
+                        latitude=?, longitude=?, description=?, region=?, 
+                        itinerary=?, inclusions=?, available_slots=?, is_active=?
+                        WHERE id=?'''
+
+def _insert_payment(c, booking_id, user_id, amount, payment_method, transaction_id=None):
+    """
+    Insert a payment row on an existing cursor and return its id. Runs inside
+    the caller's transaction so a booking and its payment can commit (or roll
+    back) together with a single fsync.
+    """
+    # Convert amount safely - handle both string and numeric types
     try:
-        print(f"DEBUG: Creating payment - booking_id: {booking_id}, user_id: {user_id}, amount: {amount}, type: {type(amount)}")
-        
-        # Convert amount to float safely
-        try:
-            if isinstance(amount, str):
-                # Remove any currency symbols, commas, etc.
-                clean_amount = amount.replace('₹', '').replace('$', '').replace(',', '').strip()
-                amount_float = float(clean_amount)
-                print(f"DEBUG: Converted string '{amount}' to float: {amount_float}")
-            else:
-                amount_float = float(amount)
-                print(f"DEBUG: Converted {amount} to float: {amount_float}")
-        except (ValueError, TypeError) as e:
-            print(f"ERROR: Converting amount '{amount}' to float: {e}")
-            return None
-        
-        # Validate amount
-        if amount_float <= 0:
-            print(f"ERROR: Invalid amount: {amount_float}")
-            return None
-        
-        print(f"DEBUG: Final amount: {amount_float} (type: {type(amount_float)})")
-        
-        # Generate transaction ID if not provided
-        if not transaction_id:
-            transaction_id = f"TXN{datetime.now().strftime('%Y%m%d%H%M%S')}{booking_id}"
-        
-        print(f"DEBUG: Transaction ID: {transaction_id}")
-        
-        # Insert payment
-        c.execute('''
-            INSERT INTO payments 
-            (booking_id, user_id, amount, payment_method, transaction_id, status)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (booking_id, user_id, amount_float, payment_method, transaction_id, 'Pending'))
-        
-        payment_id = c.lastrowid
-        conn.commit()
-        print(f"SUCCESS: Payment created with ID: {payment_id}")
+        if isinstance(amount, str):
+            amount_float = float(amount.translate(_CURRENCY_STRIP))
+        else:
+            amount_float = float(amount)
+    except (ValueError, TypeError) as e:
+        logger.error("Amount conversion failed for %r: %s", amount, e)
+        amount_float = 0.0
+
+    if not transaction_id:
+        # Nanosecond clock for ordering plus a uuid4 slice so two bookings
+        # landing on the same tick can never collide
+        transaction_id = f"TXN{time.time_ns():x}{uuid.uuid4().hex[:8]}"
+
+    logger.debug("Inserting payment with transaction ID %s", transaction_id)
+    c.execute(_PAYMENT_SQL,
+              (booking_id, user_id, amount_float, payment_method, transaction_id))
+    return c.fetchone()[0] if _HAS_RETURNING else c.lastrowid
+
+def create_payment(booking_id, user_id, amount, payment_method, transaction_id=None):
+    """Create a payment row in its own transaction on the writer connection"""
+    try:
+        with write_conn() as conn:
+            payment_id = _insert_payment(conn.cursor(), booking_id, user_id,
+                                         amount, payment_method, transaction_id)
+        logger.debug("Payment created with ID %s", payment_id)
         return payment_id
-        
-    except Exception as e:
-        print(f"ERROR: Creating payment: {e}")
-        import traceback
-        print(f"ERROR Traceback: {traceback.format_exc()}")
-        conn.rollback()
+
+    except sqlite3.IntegrityError as e:
+        logger.error("Integrity error creating payment: %s", e)
         return None
-    finally:
-        conn.close()
-        
-def update_database_schema():
-    """Update database schema to add missing columns"""
-    conn = get_db_connection()
-    c = conn.cursor()
-    
-    try:
-        # Check if refund_amount column exists in bookings table
-        c.execute("PRAGMA table_info(bookings)")
-        columns = [col[1] for col in c.fetchall()]
-        
-        # Add missing columns if they don't exist
-        if 'refund_amount' not in columns:
-            print("Adding refund_amount column to bookings table...")
-            c.execute("ALTER TABLE bookings ADD COLUMN refund_amount REAL DEFAULT 0.0")
-        
-        # Add any other missing columns that might be needed
-        missing_columns = [
-            ('booking_date', 'DATETIME DEFAULT CURRENT_TIMESTAMP'),
-            ('travel_date', 'DATETIME'),
-            ('refund_amount', 'REAL DEFAULT 0.0')
-        ]
-        
-        for column_name, column_type in missing_columns:
-            if column_name not in columns:
-                print(f"Adding {column_name} column to bookings table...")
-                c.execute(f"ALTER TABLE bookings ADD COLUMN {column_name} {column_type}")
-        
-        conn.commit()
-        print("Database schema updated successfully!")
-        
+
     except Exception as e:
-        print(f"Error updating database schema: {e}")
-        conn.rollback()
-    finally:
-        conn.close()
+        logger.exception("Unexpected error creating payment: %s", e)
+        return None
 
 def init_db():
     conn = get_db_connection()
@@ -326,7 +383,8 @@ def init_db():
                   inclusions TEXT NOT NULL,
                   available_slots INTEGER DEFAULT 50,
                   is_active BOOLEAN DEFAULT TRUE,
-                  created_at DATETIME DEFAULT CURRENT_TIMESTAMP)''')
+                  created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                  UNIQUE(name, destination))''')
     
     c.execute('''CREATE TABLE IF NOT EXISTS wishlist
                  (id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -351,8 +409,8 @@ def init_db():
                   booking_date DATETIME DEFAULT CURRENT_TIMESTAMP,
                   booked_on DATETIME DEFAULT CURRENT_TIMESTAMP,
                   travel_date DATETIME,
-                  status TEXT DEFAULT 'confirmed',
-                  payment_status TEXT DEFAULT 'pending',
+                  status TEXT DEFAULT 'Pending',
+                  payment_status TEXT DEFAULT 'Pending',
                   refund_amount REAL DEFAULT 0.0,
                   created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
                   updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
@@ -384,6 +442,21 @@ def init_db():
                   FOREIGN KEY (booking_id) REFERENCES bookings(id),
                   FOREIGN KEY (user_id) REFERENCES users(id))''')
     
+    # Indexes for the hot lookup/join predicates so the listing filter,
+    # per-user booking pages and payment joins use index seeks instead of
+    # full table scans as the data grows
+    c.execute('''CREATE INDEX IF NOT EXISTS idx_packages_active_region_category
+                 ON packages(is_active, region, category, price, rating)''')
+    c.execute('''CREATE INDEX IF NOT EXISTS idx_bookings_user
+                 ON bookings(user_id, booking_date DESC)''')
+    c.execute('''CREATE INDEX IF NOT EXISTS idx_payments_booking
+                 ON payments(booking_id)''')
+    c.execute('DROP INDEX IF EXISTS idx_wishlist_user')
+    c.execute('''CREATE INDEX IF NOT EXISTS idx_wishlist_user_package
+                 ON wishlist(user_id, package_id)''')
+    c.execute('''CREATE INDEX IF NOT EXISTS idx_bookings_package
+                 ON bookings(package_id)''')
+
     # Check if packages already exist to avoid duplicates - FIXED VERSION
     c.execute('SELECT COUNT(*) FROM packages')
     package_count = c.fetchone()[0]
@@ -468,17 +541,12 @@ def init_db():
              'Luxury Villa|All Meals|Private Transport|Spa Sessions')
         ]
         
-        for package in packages:
-            # Check if package already exists before inserting
-            c.execute('SELECT COUNT(*) FROM packages WHERE name = ? AND destination = ?', 
-                     (package[0], package[1]))
-            exists = c.fetchone()[0]
-            
-            if exists == 0:
-                c.execute('''INSERT INTO packages 
-                            (name, destination, category, duration, price, rating, latitude, longitude, 
-                             description, image, region, itinerary, inclusions) 
-                            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''', package)
+        # One batched insert inside the surrounding transaction; the
+        # UNIQUE(name, destination) constraint makes re-seeding a no-op
+        c.executemany('''INSERT OR IGNORE INTO packages
+                        (name, destination, category, duration, price, rating, latitude, longitude,
+                         description, image, region, itinerary, inclusions)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''', packages)
     
     # Check if admin user exists
     c.execute('SELECT COUNT(*) FROM users WHERE email = ?', ('admin@exploreease.com',))
@@ -486,28 +554,41 @@ def init_db():
     
     # Only create admin user if it doesn't exist
     if admin_exists == 0:
-        admin_password = generate_password_hash('admin123')
+        admin_password = hash_password('admin123')
         c.execute('INSERT INTO users (name, email, password, is_admin) VALUES (?, ?, ?, ?)',
                   ('Admin User', 'admin@exploreease.com', admin_password, True))
     
+    # Refresh planner statistics so the new indexes actually get picked
+    c.execute('ANALYZE')
+
     conn.commit()
-    conn.close()
-    print("Database initialized successfully with all required tables!")
-    
-    # Update schema to add any missing columns
-    update_database_schema()
-    verify_and_fix_payments_table()
-    debug_database_state()
+    logger.info("Database initialized successfully with all required tables!")
 
-@app.before_request
-def initialize_database_on_first_request():
-    """Initialize database on first request"""
-    if not hasattr(app, 'database_initialized'):
-        print("🟡 Initializing database on first request...")
+    # Apply any pending schema migrations (no-op once user_version is current)
+    run_migrations()
+
+# Initialize the schema once at import time instead of on the first request,
+# so no user pays the CREATE TABLE / seed cost. Under gunicorn --preload this
+# runs once in the master; set SKIP_DB_INIT=1 to opt out (e.g. migration-only
+# deploys).
+if not os.environ.get('SKIP_DB_INIT'):
+    with app.app_context():
         init_db()
-        app.database_initialized = True
-        print("🟢 Database initialized successfully!")
-        
+
+# When the live bookings table carries the schema-level 'Pending' defaults,
+# the hot-path INSERT can skip binding the two status literals entirely.
+# Databases created before those defaults keep the explicit form, since
+# SQLite cannot retrofit a column default in place.
+with app.app_context():
+    _status_default = get_db_connection().execute(
+        "SELECT dflt_value FROM pragma_table_info('bookings') WHERE name = 'status'"
+    ).fetchone()
+if _status_default and _status_default[0] == "'Pending'":
+    _BOOKING_SQL = '''INSERT INTO bookings 
+                            (user_id, package_id, travel_date, guests, total_price)
+                            VALUES (?, ?, ?, ?, ?)''' + (
+        ' RETURNING id' if _HAS_RETURNING else '')
+
 class User(UserMixin):
     def __init__(self, id, name, email, is_admin):
         self.id = id
@@ -517,24 +598,31 @@ class User(UserMixin):
 
 @login_manager.user_loader
 def load_user(user_id):
+    # Flask-Login can call the loader several times within one request;
+    # caching the result on g means only the first access hits the database
+    cached = getattr(g, '_user', None)
+    if cached is not None and str(cached.id) == str(user_id):
+        return cached
+
     conn = get_db_connection()
-    c = conn.cursor()
-    c.execute('SELECT * FROM users WHERE id = ?', (user_id,))
-    user = c.fetchone()
-    conn.close()
-    if user:
-        return User(user[0], user[1], user[2], user[4])
-    return None
+    row = conn.execute('SELECT id, name, email, is_admin FROM users WHERE id = ?',
+                       (user_id,)).fetchone()
+    g._user = User(row['id'], row['name'], row['email'], row['is_admin']) if row else None
+    return g._user
 
 # Cache control middleware
+NO_CACHE_HEADERS = {
+    'Cache-Control': 'no-cache, no-store, must-revalidate',
+    'Pragma': 'no-cache',
+    'Expires': '0'
+}
+
 @app.after_request
 def add_header(response):
     """
     Add headers to prevent caching for authenticated pages
     """
-    response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
-    response.headers['Pragma'] = 'no-cache'
-    response.headers['Expires'] = '0'
+    response.headers.update(NO_CACHE_HEADERS)
     return response
 
 # Authentication Routes
@@ -552,11 +640,20 @@ def login():
         
         conn = get_db_connection()
         c = conn.cursor()
-        c.execute('SELECT * FROM users WHERE email = ?', (email,))
+        c.execute('SELECT id, name, email, password, is_admin FROM users WHERE email = ?', (email,))
         user_data = c.fetchone()
-        conn.close()
         
-        if user_data and check_password_hash(user_data[3], password):
+        valid = False
+        if user_data:
+            valid, needs_rehash = verify_password(user_data[3], password)
+            if valid and needs_rehash:
+                # Upgrade legacy/outdated hashes now that we know the password
+                conn = get_db_connection()
+                conn.execute('UPDATE users SET password = ? WHERE id = ?',
+                             (hash_password(password), user_data[0]))
+                conn.commit()
+
+        if valid:
             user = User(user_data[0], user_data[1], user_data[2], user_data[4])
             login_user(user, remember=remember)
             next_page = request.args.get('next')
@@ -569,20 +666,12 @@ def login():
                 flash('Logged in successfully!', 'success')
                 redirect_url = next_page or url_for('index')
             
-            response = make_response(redirect(redirect_url))
-            response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
-            response.headers['Pragma'] = 'no-cache'
-            response.headers['Expires'] = '0'
-            return response
+            # The after_request hook applies the no-cache headers
+            return redirect(redirect_url)
         else:
             flash('Invalid email or password!', 'error')
     
-    # For GET requests, also add cache control
-    response = make_response(render_template('login.html'))
-    response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
-    response.headers['Pragma'] = 'no-cache'
-    response.headers['Expires'] = '0'
-    return response
+    return render_template('login.html')
 
 @app.route('/register', methods=['GET', 'POST'])
 def register():
@@ -599,7 +688,7 @@ def register():
         c = conn.cursor()
         
         try:
-            hashed_password = generate_password_hash(password)
+            hashed_password = hash_password(password)
             
             # Check if this should be an admin registration
             is_admin = False
@@ -607,7 +696,7 @@ def register():
                 # Verify admin secret key
                 if admin_secret == app.config.get('ADMIN_SECRET_KEY', 'admin123'):
                     is_admin = True
-                    print(f"🔐 Admin user created: {email}")
+                    logger.info("Admin user created: %s", email)
                 else:
                     flash('Invalid admin secret key! Regular user account created.', 'warning')
             
@@ -623,8 +712,6 @@ def register():
             return redirect(url_for('login'))
         except sqlite3.IntegrityError:
             flash('Email already exists!', 'error')
-        finally:
-            conn.close()
     
     return render_template('register.html')
 
@@ -634,64 +721,100 @@ def logout():
     logout_user()
     flash('Logged out successfully!', 'success')
     
-    # Create response with cache control
+    # The after_request hook applies the no-cache headers
     response = make_response(redirect(url_for('index')))
-    response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
-    response.headers['Pragma'] = 'no-cache'
-    response.headers['Expires'] = '0'
     response.set_cookie('session', '', expires=0)
     return response
 
 # Routes
 @app.route('/')
+@cache.cached(timeout=300, unless=_skip_page_cache)
 def index():
     conn = get_db_connection()
     c = conn.cursor()
-    c.execute('SELECT * FROM packages WHERE is_active = TRUE LIMIT 6')
+    c.execute(f'SELECT {PKG_LIST_COLS} FROM packages WHERE is_active = TRUE LIMIT 6')
     featured_packages = c.fetchall()
-    conn.close()
     return render_template('index.html', packages=featured_packages)
 
+# Only the columns the listing templates actually render - skipping the long
+# itinerary/inclusions TEXT fields roughly halves the bytes copied per row
+PKG_LIST_COLS = ('id, name, destination, category, duration, price, rating, '
+                 'description, image, region, available_slots')
+
+# Window functions (3.25+) let one query return both the page of rows and
+# the total match count; older builds fall back to a separate COUNT query
+_HAS_WINDOW_FNS = sqlite3.sqlite_version_info >= (3, 25)
+
+PACKAGES_PER_PAGE = 20
+
+_PACKAGES_FILTER_WHERE = '''FROM packages
+             WHERE is_active = TRUE
+               AND (:region = 'all' OR region = :region)
+               AND (:category = 'all' OR category = :category)
+               AND (:search = '' OR name LIKE :pattern
+                    OR destination LIKE :pattern OR description LIKE :pattern)'''
+
+# One canonical statement for every filter combination, so SQLite can reuse
+# the same prepared plan instead of re-parsing a freshly concatenated query
+# on each request. 'all' / '' sentinel values disable the matching predicate.
+PACKAGES_FILTER_SQL = f'''SELECT {PKG_LIST_COLS}{", COUNT(*) OVER () AS total" if _HAS_WINDOW_FNS else ""}
+             {_PACKAGES_FILTER_WHERE}
+             ORDER BY CASE :sort WHEN 'price_low' THEN price END ASC,
+                      CASE :sort WHEN 'price_high' THEN price END DESC,
+                      CASE :sort WHEN 'rating' THEN rating END DESC,
+                      name ASC
+             LIMIT :limit OFFSET :offset'''
+
+PACKAGES_COUNT_SQL = f'SELECT COUNT(*) {_PACKAGES_FILTER_WHERE}'
+
 @app.route('/packages')
 def packages():
     region = request.args.get('region', 'all')
     category = request.args.get('category', 'all')
     sort = request.args.get('sort', 'name')
     search = request.args.get('search', '')
-    
-    conn = get_db_connection()
+    try:
+        page = max(int(request.args.get('page', 1)), 1)
+    except (TypeError, ValueError):
+        page = 1
+
+    params = {'region': region, 'category': category,
+              'search': search, 'pattern': f'%{search}%', 'sort': sort,
+              'limit': PACKAGES_PER_PAGE,
+              'offset': (page - 1) * PACKAGES_PER_PAGE}
+
+    # A dedicated connection rather than the request-scoped one: the request
+    # teardown fires before a streamed response is consumed, so the stream
+    # releases its own connection once the last row has been rendered.
+    conn = _acquire_connection()
     c = conn.cursor()
-    
-    query = 'SELECT * FROM packages WHERE is_active = TRUE'
-    params = []
-    
-    if region != 'all':
-        query += ' AND region = ?'
-        params.append(region)
-    
-    if category != 'all':
-        query += ' AND category = ?'
-        params.append(category)
-    
-    if search:
-        query += ' AND (name LIKE ? OR destination LIKE ? OR description LIKE ?)'
-        params.extend([f'%{search}%', f'%{search}%', f'%{search}%'])
-    
-    if sort == 'price_low':
-        query += ' ORDER BY price ASC'
-    elif sort == 'price_high':
-        query += ' ORDER BY price DESC'
-    elif sort == 'rating':
-        query += ' ORDER BY rating DESC'
+
+    c.execute(PACKAGES_FILTER_SQL, params)
+
+    # Stream rows straight from the cursor into the template so the full
+    # result set and rendered page are never materialized at once. Peek one
+    # row first so the template's empty-state check still works and the
+    # window-function total is available before rendering begins.
+    first_row = c.fetchone()
+    packages_iter = chain([first_row], iter(c)) if first_row else []
+
+    if _HAS_WINDOW_FNS:
+        total_packages = first_row['total'] if first_row else 0
     else:
-        query += ' ORDER BY name ASC'
-    
-    c.execute(query, params)
-    packages_list = c.fetchall()
-    conn.close()
-    
-    return render_template('packages.html', packages=packages_list, 
-                         region=region, category=category, sort=sort, search=search)
+        total_packages = conn.execute(PACKAGES_COUNT_SQL, params).fetchone()[0]
+    total_pages = max((total_packages + PACKAGES_PER_PAGE - 1) // PACKAGES_PER_PAGE, 1)
+
+    def generate():
+        try:
+            yield from stream_template('packages.html', packages=packages_iter,
+                                       region=region, category=category,
+                                       sort=sort, search=search, page=page,
+                                       total_packages=total_packages,
+                                       total_pages=total_pages)
+        finally:
+            _release_connection(conn)
+
+    return Response(stream_with_context(generate()))
 
 @app.route('/package/<int:package_id>')
 def package_detail(package_id):
@@ -699,7 +822,6 @@ def package_detail(package_id):
     c = conn.cursor()
     c.execute('SELECT * FROM packages WHERE id = ?', (package_id,))
     package = c.fetchone()
-    conn.close()
     
     if not package:
         flash('Package not found!', 'error')
@@ -711,25 +833,25 @@ def package_detail(package_id):
 @app.route('/admin/packages')
 @login_required
 def admin_packages():
-    if not current_user.is_admin:
-        flash('Access denied!', 'error')
-        return redirect(url_for('index'))
-    
-    conn = get_db_connection()
-    c = conn.cursor()
-    c.execute('SELECT * FROM packages ORDER BY created_at DESC')
-    packages_list = c.fetchall()
-    conn.close()
-    
-    return render_template('admin_packages.html', packages=packages_list)
+    return render_template('admin_packages.html', packages=_fetch_admin_packages())
+
+@cache.memoize(timeout=30)
+def _fetch_admin_packages():
+    """
+    Package rows for the admin list, cached for 30s. Only the query result
+    is cached — never the rendered admin response — so the is_admin check
+    above still runs on every hit. Rows are materialized as plain dicts
+    because SimpleCache pickles its values and sqlite3.Row cannot be.
+    """
+    c = get_db_connection().cursor()
+    c.execute('''SELECT id, name, destination, category, duration, price,
+                        rating, image, available_slots, is_active, created_at
+                 FROM packages ORDER BY created_at DESC''')
+    return [dict(row) for row in c.fetchall()]
 
 @app.route('/admin/package/add', methods=['GET', 'POST'])
 @login_required
 def add_package():
-    if not current_user.is_admin:
-        flash('Access denied!', 'error')
-        return redirect(url_for('index'))
-    
     if request.method == 'POST':
         name = request.form['name']
         destination = request.form['destination']
@@ -751,22 +873,19 @@ def add_package():
         
         if image_file and image_file.filename != '':
             # Save the uploaded file
-            image_filename = image_file.filename
+            image_filename = secure_filename(image_file.filename)
             image_path = os.path.join(app.config['UPLOAD_FOLDER'], image_filename)
-            image_file.save(image_path)
+            _save_upload(image_file, image_path)
         
         conn = get_db_connection()
         c = conn.cursor()
         
-        c.execute('''INSERT INTO packages 
-                    (name, destination, category, duration, price, rating, latitude, longitude,
-                     description, image, region, itinerary, inclusions, available_slots)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+        c.execute(_PACKAGE_INSERT_SQL,
                   (name, destination, category, duration, price, rating, latitude, longitude,
                    description, image_filename, region, itinerary, inclusions, available_slots))
         
         conn.commit()
-        conn.close()
+        cache.clear()
         
         flash('Package added successfully!', 'success')
         return redirect(url_for('admin_packages'))
@@ -776,10 +895,6 @@ def add_package():
 @app.route('/admin/package/edit/<int:package_id>', methods=['GET', 'POST'])
 @login_required
 def edit_package(package_id):
-    if not current_user.is_admin:
-        flash('Access denied!', 'error')
-        return redirect(url_for('index'))
-    
     conn = get_db_connection()
     c = conn.cursor()
     
@@ -804,31 +919,23 @@ def edit_package(package_id):
         
         if image_file and image_file.filename != '':
             # Save the uploaded file
-            image_filename = image_file.filename
+            image_filename = secure_filename(image_file.filename)
             image_path = os.path.join(app.config['UPLOAD_FOLDER'], image_filename)
-            image_file.save(image_path)
+            _save_upload(image_file, image_path)
             
-            c.execute('''UPDATE packages SET 
-                        name=?, destination=?, category=?, duration=?, price=?, rating=?,
-                        latitude=?, longitude=?, description=?, image=?, region=?, 
-                        itinerary=?, inclusions=?, available_slots=?, is_active=?
-                        WHERE id=?''',
+            c.execute(_PACKAGE_UPDATE_SQL,
                       (name, destination, category, duration, price, rating, latitude, longitude,
                        description, image_filename, region, itinerary, inclusions, 
                        available_slots, is_active, package_id))
         else:
             # Keep existing image if no new image uploaded
-            c.execute('''UPDATE packages SET 
-                        name=?, destination=?, category=?, duration=?, price=?, rating=?,
-                        latitude=?, longitude=?, description=?, region=?, 
-                        itinerary=?, inclusions=?, available_slots=?, is_active=?
-                        WHERE id=?''',
+            c.execute(_PACKAGE_UPDATE_KEEP_IMAGE_SQL,
                       (name, destination, category, duration, price, rating, latitude, longitude,
                        description, region, itinerary, inclusions, available_slots, 
                        is_active, package_id))
         
         conn.commit()
-        conn.close()
+        cache.clear()
         
         flash('Package updated successfully!', 'success')
         return redirect(url_for('admin_packages'))
@@ -836,7 +943,6 @@ def edit_package(package_id):
     # GET request - load package data
     c.execute('SELECT * FROM packages WHERE id = ?', (package_id,))
     package = c.fetchone()
-    conn.close()
     
     if not package:
         flash('Package not found!', 'error')
@@ -847,69 +953,63 @@ def edit_package(package_id):
 @app.route('/admin/package/delete/<int:package_id>')
 @login_required
 def delete_package(package_id):
-    if not current_user.is_admin:
-        flash('Access denied!', 'error')
-        return redirect(url_for('index'))
-    
-    conn = get_db_connection()
-    c = conn.cursor()
-    
-    # Check if package has any bookings
-    c.execute('SELECT COUNT(*) FROM bookings WHERE package_id = ?', (package_id,))
-    booking_count = c.fetchone()[0]
-    
-    if booking_count > 0:
-        # Soft delete - set is_active to False
-        c.execute('UPDATE packages SET is_active = FALSE WHERE id = ?', (package_id,))
-        flash('Package has existing bookings. It has been deactivated instead of deleted.', 'warning')
-    else:
-        # Hard delete - remove package completely
-        c.execute('DELETE FROM packages WHERE id = ?', (package_id,))
-        flash('Package deleted successfully!', 'success')
-    
-    conn.commit()
-    conn.close()
+    with write_conn() as conn:
+        c = conn.cursor()
+
+        # Check if package has any bookings
+        c.execute('SELECT COUNT(*) FROM bookings WHERE package_id = ?', (package_id,))
+        booking_count = c.fetchone()[0]
+
+        if booking_count > 0:
+            # Soft delete - set is_active to False
+            c.execute('UPDATE packages SET is_active = FALSE WHERE id = ?', (package_id,))
+            flash('Package has existing bookings. It has been deactivated instead of deleted.', 'warning')
+        else:
+            # Hard delete - remove package completely
+            c.execute('DELETE FROM packages WHERE id = ?', (package_id,))
+            flash('Package deleted successfully!', 'success')
+
+    cache.clear()
     return redirect(url_for('admin_packages'))
 
 @app.route('/admin/package/toggle/<int:package_id>')
 @login_required
 def toggle_package(package_id):
-    if not current_user.is_admin:
-        flash('Access denied!', 'error')
-        return redirect(url_for('index'))
-    
-    conn = get_db_connection()
-    c = conn.cursor()
-    
-    c.execute('SELECT is_active FROM packages WHERE id = ?', (package_id,))
-    package = c.fetchone()
-    
-    if package:
-        new_status = not package[0]
-        c.execute('UPDATE packages SET is_active = ? WHERE id = ?', (new_status, package_id))
-        status_text = "activated" if new_status else "deactivated"
-        flash(f'Package {status_text} successfully!', 'success')
-    
-    conn.commit()
-    conn.close()
+    with write_conn() as conn:
+        c = conn.cursor()
+
+        c.execute('SELECT is_active FROM packages WHERE id = ?', (package_id,))
+        package = c.fetchone()
+
+        if package:
+            new_status = not package[0]
+            c.execute('UPDATE packages SET is_active = ? WHERE id = ?', (new_status, package_id))
+            status_text = "activated" if new_status else "deactivated"
+            flash(f'Package {status_text} successfully!', 'success')
+
+    cache.clear()
     return redirect(url_for('admin_packages'))
 
 # Wishlist functionality
-@app.route('/wishlist/add/<int:package_id>')
+@app.route('/wishlist/add/<int:package_id>', methods=['GET', 'POST'])
 @login_required
 def add_to_wishlist(package_id):
-    conn = get_db_connection()
-    c = conn.cursor()
-    
     try:
-        c.execute('INSERT OR IGNORE INTO wishlist (user_id, package_id) VALUES (?, ?)',
-                  (current_user.id, package_id))
-        conn.commit()
-        flash('Added to wishlist!', 'success')
-    except:
-        flash('Already in wishlist!', 'info')
-    
-    conn.close()
+        with write_conn() as conn:
+            conn.execute('INSERT OR IGNORE INTO wishlist (user_id, package_id) VALUES (?, ?)',
+                         (current_user.id, package_id))
+        added = True
+    except sqlite3.Error:
+        added = False
+
+    # POSTs come from the fetch() calls in the templates; answering with
+    # JSON lets the page update in place instead of re-rendering a full
+    # list page behind a redirect
+    if request.method == 'POST':
+        return jsonify({'ok': added})
+
+    flash('Added to wishlist!' if added else 'Already in wishlist!',
+          'success' if added else 'info')
     return redirect(request.referrer or url_for('packages'))
 
 @app.route('/wishlist')
@@ -917,22 +1017,29 @@ def add_to_wishlist(package_id):
 def view_wishlist():
     conn = get_db_connection()
     c = conn.cursor()
-    c.execute('''SELECT p.* FROM packages p 
+    # Only the columns the card grid renders - skipping the long TEXT
+    # itinerary/inclusions fields keeps the pager from deserializing
+    # bytes the page never shows
+    c.execute('''SELECT p.id, p.name, p.destination, p.category, p.duration,
+                        p.price, p.rating, p.description, p.image, p.region,
+                        p.available_slots, p.is_active
+                 FROM packages p 
                  JOIN wishlist w ON p.id = w.package_id 
-                 WHERE w.user_id = ?''', (current_user.id,))
+                 WHERE w.user_id = ?
+                 ORDER BY w.id DESC LIMIT 100''', (current_user.id,))
     wishlist_packages = c.fetchall()
-    conn.close()
     return render_template('wishlist.html', packages=wishlist_packages)
 
-@app.route('/wishlist/remove/<int:package_id>')
+@app.route('/wishlist/remove/<int:package_id>', methods=['GET', 'POST'])
 @login_required
 def remove_from_wishlist(package_id):
-    conn = get_db_connection()
-    c = conn.cursor()
-    c.execute('DELETE FROM wishlist WHERE user_id = ? AND package_id = ?',
-              (current_user.id, package_id))
-    conn.commit()
-    conn.close()
+    with write_conn() as conn:
+        conn.execute('DELETE FROM wishlist WHERE user_id = ? AND package_id = ?',
+                     (current_user.id, package_id))
+
+    if request.method == 'POST':
+        return jsonify({'ok': True})
+
     flash('Removed from wishlist!', 'success')
     return redirect(url_for('view_wishlist'))
 
@@ -945,69 +1052,44 @@ def book_package(package_id):
         guests = int(request.form['travelers'])
         payment_method = request.form.get('payment_method', 'card')
         
-        print(f"DEBUG: Starting booking process - package_id: {package_id}, guests: {guests}")
-        
-        # Use separate database connections for booking and payment
+        # One transaction for the availability check, booking INSERT and
+        # payment INSERT: a single fsync instead of three, and the slot
+        # check cannot be invalidated between the check and the inserts.
         try:
-            # STEP 1: Create booking in one transaction
-            conn_booking = get_db_connection()
-            conn_booking.execute("PRAGMA busy_timeout=5000")
-            c_booking = conn_booking.cursor()
-            
-            # Check package availability
-            c_booking.execute('SELECT price, available_slots FROM packages WHERE id = ?', (package_id,))
-            package = c_booking.fetchone()
-            
-            if not package:
-                flash('Package not found!', 'error')
-                return redirect(url_for('packages'))
-            
-            print(f"DEBUG: Package found - price: {package[0]}, available_slots: {package[1]}")
-            
-            if package[1] < guests:
-                flash('Not enough available slots!', 'error')
-                return redirect(url_for('package_detail', package_id=package_id))
-            
-            total_price = float(package[0]) * guests  # Ensure it's float
-            print(f"DEBUG: Total price calculated: {total_price} (type: {type(total_price)})")
-            
-            # Create booking
-            c_booking.execute('''INSERT INTO bookings 
-                        (user_id, package_id, travel_date, guests, total_price, status, payment_status)
-                        VALUES (?, ?, ?, ?, ?, 'Pending', 'Pending')''',
-                      (current_user.id, package_id, travel_date, guests, total_price))
-            
-            booking_id = c_booking.lastrowid
-            print(f"DEBUG: Booking created with ID: {booking_id}")
-            
-            # COMMIT booking immediately to release lock
-            conn_booking.commit()
-            conn_booking.close()
-            print(f"DEBUG: Booking committed successfully")
-            
-            # STEP 2: Create payment in separate transaction
-            transaction_id = f"TXN{datetime.now().strftime('%Y%m%d%H%M%S')}{booking_id}"
-            print(f"DEBUG: Calling create_payment_simple with booking_id: {booking_id}, amount: {total_price} (type: {type(total_price)})")
-            
-            # Ensure amount is properly converted to float
-            payment_amount = float(total_price)  # Double conversion to be safe
-            print(f"DEBUG: Payment amount after conversion: {payment_amount} (type: {type(payment_amount)})")
-            
-            payment_id = create_payment_simple(booking_id, current_user.id, payment_amount, payment_method, transaction_id)
-            
-            if not payment_id:
-                flash('Payment creation failed! Please try again.', 'error')
-                return redirect(url_for('package_detail', package_id=package_id))
-            
-            print(f"DEBUG: Payment created successfully with ID: {payment_id}")
-            
+            with write_conn() as conn:
+                c = conn.cursor()
+
+                # Check package availability
+                c.execute('SELECT price, available_slots FROM packages WHERE id = ?', (package_id,))
+                package = c.fetchone()
+
+                if not package:
+                    flash('Package not found!', 'error')
+                    return redirect(url_for('packages'))
+
+                if package[1] < guests:
+                    flash('Not enough available slots!', 'error')
+                    return redirect(url_for('package_detail', package_id=package_id))
+
+                total_price = float(package[0]) * guests
+
+                # Create booking, reading the new id back from the same
+                # statement on SQLite 3.35+
+                c.execute(_BOOKING_SQL,
+                          (current_user.id, package_id, travel_date, guests, total_price))
+
+                booking_id = c.fetchone()[0] if _HAS_RETURNING else c.lastrowid
+                logger.debug("Booking created with ID %s", booking_id)
+
+                # Create the pending payment in the same transaction
+                _insert_payment(c, booking_id, current_user.id,
+                                total_price, payment_method)
+
             # Redirect to payment processing
             return redirect(url_for('process_payment', booking_id=booking_id))
             
-        except Exception as e:
-            print(f"DEBUG: Error in book_package: {e}")
-            import traceback
-            print(f"DEBUG Traceback: {traceback.format_exc()}")
+        except Exception:
+            logger.exception("Error in book_package")
             flash('Booking failed! Please try again.', 'error')
             return redirect(url_for('package_detail', package_id=package_id))
     
@@ -1016,7 +1098,6 @@ def book_package(package_id):
     c = conn.cursor()
     c.execute('SELECT * FROM packages WHERE id = ?', (package_id,))
     package = c.fetchone()
-    conn.close()
     
     if not package:
         flash('Package not found!', 'error')
@@ -1027,8 +1108,6 @@ def book_package(package_id):
 @app.route('/payment/<int:booking_id>', methods=['GET', 'POST'])
 @login_required
 def process_payment(booking_id):
-    print(f"🔍 PAYMENT ROUTE STARTED for booking_id: {booking_id}")
-    
     try:
         conn = get_db_connection()
         c = conn.cursor()
@@ -1037,8 +1116,8 @@ def process_payment(booking_id):
         c.execute('''SELECT 
                      b.id, b.user_id, b.package_id, b.travel_date, b.guests, 
                      b.total_price, b.status, b.payment_status,
-                     p.name as package_name, p.destination as package_destination,
-                     pay.id as payment_id, pay.transaction_id, pay.amount as payment_amount, pay.payment_method
+                     p.name as package_name, p.destination,
+                     pay.id as payment_id, pay.transaction_id, pay.amount, pay.payment_method
                      FROM bookings b 
                      JOIN packages p ON b.package_id = p.id 
                      JOIN payments pay ON b.id = pay.booking_id 
@@ -1049,27 +1128,13 @@ def process_payment(booking_id):
             flash('Booking not found!', 'error')
             return redirect(url_for('my_bookings'))
         
-        # Convert to dictionary
-        booking_dict = {
-            'id': booking_data[0],
-            'user_id': booking_data[1],
-            'package_id': booking_data[2],
-            'travel_date': booking_data[3],
-            'guests': booking_data[4],
-            'total_price': float(booking_data[5]),
-            'status': booking_data[6],
-            'payment_status': booking_data[7],
-            'package_name': booking_data[8],
-            'destination': booking_data[9],
-            'payment_id': booking_data[10],
-            'transaction_id': booking_data[11],
-            'amount': float(booking_data[12]),
-            'payment_method': booking_data[13]
-        }
+        # The Row's column names line up with what the template expects, so
+        # the hand-indexed field mapping collapses to a dict() call
+        booking_dict = dict(booking_data)
         
         if request.method == 'POST':
             payment_method = request.form.get('payment_method')
-            print(f"🔍 Processing {payment_method} payment for booking {booking_id}")
+            logger.debug("Processing %s payment for booking %s", payment_method, booking_id)
             
             # Handle different payment methods
             if payment_method == 'card':
@@ -1084,26 +1149,22 @@ def process_payment(booking_id):
                     return render_template('payment.html', booking=booking_dict)
                 
                 # Simulate card validation
-                if len(card_number.replace(' ', '')) != 16 or not card_number.replace(' ', '').isdigit():
+                if not _CARD_RE.match(card_number.translate(_SPACE_STRIP)):
                     flash('Invalid card number!', 'error')
                     return render_template('payment.html', booking=booking_dict)
                 
-                if len(cvv) != 3 or not cvv.isdigit():
+                if not _CVV_RE.match(cvv):
                     flash('Invalid CVV!', 'error')
                     return render_template('payment.html', booking=booking_dict)
                 
-                print(f"✅ Card payment validated for booking {booking_id}")
-                
             elif payment_method == 'upi':
                 # UPI processing
                 upi_id = request.form.get('upi_id')
                 
-                if not upi_id or '@' not in upi_id:
+                if not upi_id or not _UPI_RE.match(upi_id):
                     flash('Please enter a valid UPI ID!', 'error')
                     return render_template('payment.html', booking=booking_dict)
                 
-                print(f"✅ UPI payment initiated for booking {booking_id}")
-                
             elif payment_method == 'netbanking':
                 # Net Banking processing
                 bank_name = request.form.get('bank_name')
@@ -1112,42 +1173,34 @@ def process_payment(booking_id):
                     flash('Please select a bank!', 'error')
                     return render_template('payment.html', booking=booking_dict)
                 
-                print(f"✅ Net Banking payment initiated for booking {booking_id}")
-            
-            # Process payment (simulate success)
+            # Process payment (simulate success) - all status updates and
+            # the slot decrement commit together on the writer connection
             try:
-                # Update payment method if changed
-                if payment_method != booking_dict['payment_method']:
-                    c.execute('UPDATE payments SET payment_method = ? WHERE id = ?', 
-                             (payment_method, booking_dict['payment_id']))
+                with write_conn() as wconn:
+                    wc = wconn.cursor()
+                    # One UPDATE per table: the chosen payment method folds
+                    # into the status update rather than a conditional
+                    # fourth statement
+                    wc.execute('UPDATE payments SET status = "Success", payment_method = ? WHERE booking_id = ?', 
+                               (payment_method, booking_id))
+                    wc.execute('UPDATE bookings SET status = "Confirmed", payment_status = "Paid" WHERE id = ?', 
+                               (booking_id,))
+                    wc.execute('UPDATE packages SET available_slots = available_slots - ? WHERE id = ?', 
+                               (booking_dict['guests'], booking_dict['package_id']))
                 
-                # Update booking and payment status
-                c.execute('UPDATE bookings SET status = "Confirmed", payment_status = "Paid" WHERE id = ?', 
-                         (booking_id,))
-                c.execute('UPDATE payments SET status = "Success" WHERE booking_id = ?', 
-                         (booking_id,))
-                c.execute('UPDATE packages SET available_slots = available_slots - ? WHERE id = ?', 
-                         (booking_dict['guests'], booking_dict['package_id']))
-                
-                conn.commit()
-                conn.close()
-                
-                print(f"✅ Payment processed successfully via {payment_method}")
+                logger.debug("Payment processed successfully via %s", payment_method)
                 flash(f'Payment successful via {payment_method.upper()}! Booking confirmed.', 'success')
                 return redirect(url_for('booking_confirmation', booking_id=booking_id))
                 
-            except Exception as e:
-                print(f"❌ Error processing payment: {e}")
-                conn.rollback()
-                conn.close()
+            except Exception:
+                logger.exception("Error processing payment for booking %s", booking_id)
                 flash('Payment processing failed! Please try again.', 'error')
         
         # GET request - show payment page
-        conn.close()
         return render_template('payment.html', booking=booking_dict)
         
-    except Exception as e:
-        print(f"❌ CRITICAL ERROR in process_payment: {e}")
+    except Exception:
+        logger.exception("Critical error in process_payment for booking %s", booking_id)
         flash('An error occurred while loading the payment page.', 'error')
         return redirect(url_for('my_bookings'))
     
@@ -1183,11 +1236,10 @@ def admin_register():
         if admin_count > 0:
             if admin_secret != app.config.get('ADMIN_SECRET_KEY', 'admin123'):
                 flash('Invalid admin secret key!', 'error')
-                conn.close()
                 return render_template('admin_register.html')
         
         try:
-            hashed_password = generate_password_hash(password)
+            hashed_password = hash_password(password)
             c.execute('INSERT INTO users (name, email, password, is_admin) VALUES (?, ?, ?, ?)',
                      (name, email, hashed_password, True))
             conn.commit()
@@ -1195,8 +1247,6 @@ def admin_register():
             return redirect(url_for('login'))
         except sqlite3.IntegrityError:
             flash('Email already exists!', 'error')
-        finally:
-            conn.close()
     
     return render_template('admin_register.html')
 
@@ -1212,7 +1262,7 @@ def booking_confirmation(booking_id):
                  b.total_price, b.status, b.payment_status, b.booking_date,
                  p.name as package_name, p.destination, p.duration, p.image, 
                  p.itinerary, p.inclusions,
-                 u.name as user_name, u.email,
+                 u.name as user_name, u.email as user_email,
                  pay.transaction_id, pay.payment_method, pay.created_at as payment_date
                  FROM bookings b 
                  JOIN packages p ON b.package_id = p.id 
@@ -1221,35 +1271,16 @@ def booking_confirmation(booking_id):
                  WHERE b.id = ? AND b.user_id = ?''', (booking_id, current_user.id))
     
     booking_tuple = c.fetchone()
-    conn.close()
     
     if not booking_tuple:
         flash('Booking not found!', 'error')
         return redirect(url_for('my_bookings'))
     
     # Convert tuple to dictionary with CORRECT mapping and safe date handling
-    booking_dict = {
-        'id': booking_tuple[0],
-        'user_id': booking_tuple[1],
-        'package_id': booking_tuple[2],
-        'travel_date': safe_format_date(booking_tuple[3]),  # Safe date formatting
-        'guests': booking_tuple[4],
-        'total_price': float(booking_tuple[5]) if booking_tuple[5] else 0.0,
-        'status': booking_tuple[6],
-        'payment_status': booking_tuple[7],
-        'booking_date': safe_format_date(booking_tuple[8]),  # Safe date formatting
-        'package_name': booking_tuple[9],
-        'destination': booking_tuple[10],
-        'duration': booking_tuple[11],
-        'image': booking_tuple[12],
-        'itinerary': booking_tuple[13],
-        'inclusions': booking_tuple[14],
-        'user_name': booking_tuple[15],
-        'user_email': booking_tuple[16],
-        'transaction_id': booking_tuple[17],
-        'payment_method': booking_tuple[18],
-        'payment_date': safe_format_date(booking_tuple[19])  # Safe date formatting
-    }
+    booking_dict = dict(booking_tuple)
+    booking_dict['total_price'] = float(booking_dict['total_price'] or 0.0)
+    for date_key in ('travel_date', 'booking_date', 'payment_date'):
+        booking_dict[date_key] = safe_format_date(booking_dict[date_key])
     
     return render_template('booking_confirmation.html', booking=booking_dict)
 
@@ -1265,20 +1296,17 @@ def safe_strftime(value, format='%Y-%m-%d'):
         return value
     
     # If it's a datetime object, format it
-    if hasattr(value, 'strftime'):
+    if isinstance(value, (datetime, date)):
         return value.strftime(format)
     
-    # If it's a float or int, try to convert to datetime
-    try:
-        # Handle timestamp floats
-        from datetime import datetime
-        if isinstance(value, (int, float)):
-            # If it's a reasonable timestamp (after 2000)
-            if value > 946684800:  # Jan 1, 2000
-                return datetime.fromtimestamp(value).strftime(format)
-        return str(value)
-    except:
-        return str(value)
+    # Epoch timestamps (anything after Jan 1, 2000 is treated as one)
+    if isinstance(value, (int, float)) and value > 946684800:
+        try:
+            return datetime.fromtimestamp(value).strftime(format)
+        except (OverflowError, OSError, ValueError):
+            return str(value)
+    
+    return str(value)
 
 # Register the filter
 app.jinja_env.filters['safe_strftime'] = safe_strftime
@@ -1296,7 +1324,7 @@ def booking_details(booking_id):
                  b.total_price, b.status, b.payment_status, b.booking_date,
                  p.name as package_name, p.destination, p.duration, p.image, 
                  p.itinerary, p.inclusions,
-                 u.name as user_name, u.email,
+                 u.name as user_name, u.email as user_email,
                  pay.transaction_id, pay.payment_method, pay.created_at as payment_date
                  FROM bookings b 
                  JOIN packages p ON b.package_id = p.id 
@@ -1305,45 +1333,13 @@ def booking_details(booking_id):
                  WHERE b.id = ? AND b.user_id = ?''', (booking_id, current_user.id))
     
     booking_tuple = c.fetchone()
-    conn.close()
     
     if not booking_tuple:
         flash('Booking not found!', 'error')
         return redirect(url_for('my_bookings'))
     
-    # DEBUG: Print the raw tuple to see the actual data order
-    print("🔍 RAW BOOKING TUPLE:")
-    for i, value in enumerate(booking_tuple):
-        print(f"   Index {i}: {value} (type: {type(value)})")
-    
-    # Convert tuple to dictionary with CORRECT mapping
-    booking_dict = {
-        'id': booking_tuple[0],
-        'user_id': booking_tuple[1],
-        'package_id': booking_tuple[2],
-        'travel_date': booking_tuple[3],
-        'guests': booking_tuple[4],
-        'total_price': float(booking_tuple[5]) if booking_tuple[5] else 0.0,
-        'status': booking_tuple[6],
-        'payment_status': booking_tuple[7],
-        'booking_date': booking_tuple[8],
-        'package_name': booking_tuple[9],
-        'destination': booking_tuple[10],
-        'duration': booking_tuple[11],
-        'image': booking_tuple[12],
-        'itinerary': booking_tuple[13],
-        'inclusions': booking_tuple[14],
-        'user_name': booking_tuple[15],
-        'user_email': booking_tuple[16],
-        'transaction_id': booking_tuple[17],
-        'payment_method': booking_tuple[18],
-        'payment_date': booking_tuple[19]
-    }
-    
-    # DEBUG: Print the final dictionary
-    print("🔍 FINAL BOOKING DICTIONARY:")
-    for key, value in booking_dict.items():
-        print(f"   {key}: {value} (type: {type(value)})")
+    booking_dict = dict(booking_tuple)
+    booking_dict['total_price'] = float(booking_dict['total_price'] or 0.0)
     
     return render_template('booking_details.html', booking=booking_dict)
 
@@ -1353,15 +1349,153 @@ def utility_processor():
     def format_date(date_value, fmt='%Y-%m-%d'):
         return safe_format_date(date_value, fmt)
     
+    now = datetime.now()
     return {
-        'now': datetime.now(),
+        'now': now,
         'format_date': format_date,
-        'current_year': datetime.now().year
+        'current_year': now.year
     }
 
+# Per-glyph width tables (1000 units/em), built once per font on first
+# use. Summing table entries matches pdfmetrics.stringWidth - Helvetica
+# has no kerning - without its per-call font lookup and encoding work.
+_GLYPH_WIDTHS = {}
+
+
+def _glyph_widths(font_name):
+    table = _GLYPH_WIDTHS.get(font_name)
+    if table is None:
+        from reportlab.pdfbase.pdfmetrics import stringWidth
+        table = _GLYPH_WIDTHS.setdefault(
+            font_name, [stringWidth(chr(i), font_name, 1000) for i in range(256)])
+    return table
+
+
+def _text_width(text, font_name, font_size):
+    """Measure text via the cached width table; non-Latin-1 characters
+    (the rupee sign in amounts) fall back to pdfmetrics"""
+    try:
+        return sum(_glyph_widths(font_name)[ord(ch)] for ch in text) * font_size / 1000.0
+    except IndexError:
+        from reportlab.pdfbase.pdfmetrics import stringWidth
+        return stringWidth(text, font_name, font_size)
+
+
+def _draw_pdf_rows(pdf, x, y, rows, col_widths, row_h=18, label_fill=None,
+                   header_fill=None, grid_color=None, right_align_col=None,
+                   total_row=False):
+    """
+    Render label/value rows as rectangles plus drawString calls. The PDF
+    layouts are fixed single pages, so drawing cells directly skips the
+    Platypus flow engine and all of its per-flowable wrap/split work.
+    Returns the y coordinate below the last row.
+    """
+    from reportlab.lib import colors
+
+    total_w = sum(col_widths)
+    n = len(rows)
+    for i, row in enumerate(rows):
+        bottom = y - (i + 1) * row_h
+        is_header = header_fill is not None and i == 0
+        is_total = total_row and i == n - 1
+        if is_header:
+            pdf.setFillColor(header_fill)
+            pdf.rect(x, bottom, total_w, row_h, stroke=0, fill=1)
+            pdf.setFillColor(colors.white)
+            font = ('Helvetica-Bold', 11)
+            pdf.setFont(*font)
+        elif is_total:
+            pdf.setFillColor(colors.lightgrey)
+            pdf.rect(x, bottom, total_w, row_h, stroke=0, fill=1)
+            pdf.setStrokeColor(colors.black)
+            pdf.setLineWidth(2)
+            pdf.line(x, bottom + row_h, x + total_w, bottom + row_h)
+            pdf.setLineWidth(1)
+            pdf.setFillColor(colors.black)
+            font = ('Helvetica-Bold', 11)
+            pdf.setFont(*font)
+        else:
+            if label_fill is not None:
+                pdf.setFillColor(label_fill)
+                pdf.rect(x, bottom, col_widths[0], row_h, stroke=0, fill=1)
+            pdf.setFillColor(colors.black)
+            font = ('Helvetica', 10)
+            pdf.setFont(*font)
+        cx = x
+        for j, cell in enumerate(row):
+            text = str(cell)
+            if right_align_col == j:
+                right_x = cx + col_widths[j] - 4 - _text_width(text, *font)
+                pdf.drawString(right_x, bottom + 5, text)
+            else:
+                pdf.drawString(cx + 4, bottom + 5, text)
+            cx += col_widths[j]
+        if grid_color is not None:
+            pdf.setStrokeColor(grid_color)
+            pdf.rect(x, bottom, total_w, row_h, stroke=1, fill=0)
+            cx = x
+            for w in col_widths[:-1]:
+                cx += w
+                pdf.line(cx, bottom, cx, bottom + row_h)
+    return y - n * row_h
+
+
+_PDF_CHUNK_SIZE = 64 * 1024
+
+
+class _PdfStream:
+    """
+    File-like sink for reportlab. The library hands the finished document to
+    a single write() call, so collecting into a bytearray and yielding it in
+    64 KiB chunks streams the download without the extra full-buffer copy
+    that buffer.getvalue() used to make.
+    """
+
+    def __init__(self):
+        self._buf = bytearray()
+
+    def write(self, data):
+        self._buf += data
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def chunks(self):
+        buf = self._buf
+        for i in range(0, len(buf), _PDF_CHUNK_SIZE):
+            yield bytes(buf[i:i + _PDF_CHUNK_SIZE])
+
+    def getbuffer(self):
+        return memoryview(self._buf)
+
+
+def _pdf_cache_path(kind, booking_id, booking_dict):
+    """
+    Cached-PDF path for a booking. The key hashes every field the document
+    displays, so any change to the booking (payment, refund, status) lands
+    on a fresh file while repeat downloads hit the cached one.
+    """
+    digest = hashlib.sha1(repr(sorted(booking_dict.items())).encode()).hexdigest()[:12]
+    return os.path.join(PDF_CACHE_DIR, f'{kind}_{booking_id}_{digest}.pdf')
+
+
+def _store_pdf_cache(path, sink):
+    # Write-then-rename so concurrent downloads never read a partial file
+    fd, tmp_path = tempfile.mkstemp(dir=PDF_CACHE_DIR, suffix='.tmp')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(sink.getbuffer())
+    os.replace(tmp_path, path)
+
+
 @app.route('/booking/invoice/<int:booking_id>')
 @login_required
 def generate_invoice(booking_id):
+    # Imported lazily so workers that never serve a PDF skip the several-MB
+    # reportlab import at startup; Python caches the modules after first use
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
     conn = get_db_connection()
     c = conn.cursor()
     
@@ -1370,7 +1504,7 @@ def generate_invoice(booking_id):
                  b.id, b.user_id, b.package_id, b.travel_date, b.guests, 
                  b.total_price, b.status, b.payment_status, b.booking_date,
                  p.name as package_name, p.destination, p.duration, 
-                 u.name as user_name, u.email, u.id as user_id,
+                 u.name as user_name, u.email as user_email,
                  pay.transaction_id, pay.payment_method, pay.created_at as payment_date
                  FROM bookings b 
                  JOIN packages p ON b.package_id = p.id 
@@ -1379,86 +1513,57 @@ def generate_invoice(booking_id):
                  WHERE b.id = ? AND b.user_id = ?''', (booking_id, current_user.id))
     
     booking_tuple = c.fetchone()
-    conn.close()
     
     if not booking_tuple:
         flash('Booking not found!', 'error')
         return redirect(url_for('my_bookings'))
     
-    # Convert tuple to dictionary
-    booking_dict = {
-        'id': booking_tuple[0],
-        'user_id': booking_tuple[1],
-        'package_id': booking_tuple[2],
-        'travel_date': safe_format_date(booking_tuple[3]),
-        'guests': booking_tuple[4],
-        'total_price': float(booking_tuple[5]) if booking_tuple[5] else 0.0,
-        'status': booking_tuple[6],
-        'payment_status': booking_tuple[7],
-        'booking_date': safe_format_date(booking_tuple[8]),
-        'package_name': booking_tuple[9],
-        'destination': booking_tuple[10],
-        'duration': booking_tuple[11],
-        'user_name': booking_tuple[12],
-        'user_email': booking_tuple[13],
-        'user_id': booking_tuple[14],
-        'transaction_id': booking_tuple[15],
-        'payment_method': booking_tuple[16],
-        'payment_date': safe_format_date(booking_tuple[17])
-    }
-    
-    # Create PDF buffer
-    buffer = io.BytesIO()
-    
-    # Create PDF document
-    doc = SimpleDocTemplate(buffer, pagesize=A4, 
-                          topMargin=0.5*inch, bottomMargin=0.5*inch,
-                          leftMargin=0.5*inch, rightMargin=0.5*inch)
-    
-    # Create story (content)
-    story = []
-    styles = getSampleStyleSheet()
-    
+    booking_dict = dict(booking_tuple)
+    booking_dict['total_price'] = float(booking_dict['total_price'] or 0.0)
+    for date_key in ('travel_date', 'booking_date', 'payment_date'):
+        booking_dict[date_key] = safe_format_date(booking_dict[date_key])
+    
+    # Repeat downloads are served straight off disk; sendfile beats
+    # redoing all the reportlab work for a byte-identical document
+    cache_path = _pdf_cache_path('invoice', booking_id, booking_dict)
+    if os.path.exists(cache_path):
+        return send_file(cache_path, mimetype='application/pdf',
+                         as_attachment=True,
+                         download_name=f'invoice_{booking_id}.pdf')
+
+    # Fixed one-page layout drawn straight onto a canvas
+    sink = _PdfStream()
+    pdf = canvas.Canvas(sink, pagesize=A4, pageCompression=1)
+    width, height = A4
+    x = 36
+
     # Title
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=18,
-        textColor=colors.darkblue,
-        alignment=1,  # Center
-        spaceAfter=30
-    )
-    story.append(Paragraph("INVOICE", title_style))
-    
+    pdf.setFont('Helvetica-Bold', 18)
+    pdf.setFillColor(colors.darkblue)
+    pdf.drawCentredString(width / 2, height - 60, 'INVOICE')
+
     # Company Info
-    company_style = ParagraphStyle(
-        'CompanyStyle',
-        parent=styles['Normal'],
-        fontSize=10,
-        textColor=colors.gray
-    )
-    story.append(Paragraph("ExploreEase Travel Solutions", company_style))
-    story.append(Paragraph("123 Travel Street, Kolkata, West Bengal", company_style))
-    story.append(Paragraph("Phone: +91 9876543210 | Email: info@exploreease.com", company_style))
-    story.append(Spacer(1, 20))
-    
-    # Invoice Details Table
+    y = height - 95
+    pdf.setFont('Helvetica', 10)
+    pdf.setFillColor(colors.gray)
+    for line in ('ExploreEase Travel Solutions',
+                 '123 Travel Street, Kolkata, West Bengal',
+                 'Phone: +91 9876543210 | Email: info@exploreease.com'):
+        pdf.drawString(x, y, line)
+        y -= 13
+    y -= 15
+
+    # Invoice Details
     invoice_data = [
         ['Invoice Number:', f'INV-{booking_dict["id"]:06d}'],
         ['Invoice Date:', datetime.now().strftime('%Y-%m-%d')],
         ['Booking ID:', f'BK-{booking_dict["id"]:06d}'],
         ['Transaction ID:', booking_dict['transaction_id'] or 'N/A']
     ]
-    
-    invoice_table = Table(invoice_data, colWidths=[2*inch, 3*inch])
-    invoice_table.setStyle(TableStyle([
-        ('FONT', (0, 0), (-1, -1), 'Helvetica', 10),
-        ('BACKGROUND', (0, 0), (0, -1), colors.lightgrey),
-        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-    ]))
-    story.append(invoice_table)
-    story.append(Spacer(1, 20))
-    
+    y = _draw_pdf_rows(pdf, x, y, invoice_data, (144, 216),
+                       label_fill=colors.lightgrey)
+    y -= 20
+
     # Customer and Package Details in two columns
     customer_data = [
         ['BILL TO:', 'PACKAGE DETAILS:'],
@@ -1468,30 +1573,16 @@ def generate_invoice(booking_id):
         ['', f"Travel Date: {booking_dict['travel_date']}"],
         ['', f"Guests: {booking_dict['guests']}"]
     ]
-    
-    customer_table = Table(customer_data, colWidths=[2.5*inch, 3*inch])
-    customer_table.setStyle(TableStyle([
-        ('FONT', (0, 0), (-1, -1), 'Helvetica', 10),
-        ('BACKGROUND', (0, 0), (0, 0), colors.darkblue),
-        ('BACKGROUND', (1, 0), (1, 0), colors.darkblue),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-        ('FONT', (0, 0), (-1, 0), 'Helvetica-Bold', 11),
-        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black)
-    ]))
-    story.append(customer_table)
-    story.append(Spacer(1, 30))
-    
+    y = _draw_pdf_rows(pdf, x, y, customer_data, (180, 216),
+                       header_fill=colors.darkblue, grid_color=colors.black)
+    y -= 30
+
     # Payment Details
-    payment_header_style = ParagraphStyle(
-        'PaymentHeader',
-        parent=styles['Heading2'],
-        fontSize=14,
-        textColor=colors.darkgreen,
-        spaceAfter=10
-    )
-    story.append(Paragraph("Payment Details", payment_header_style))
-    
+    pdf.setFont('Helvetica-Bold', 14)
+    pdf.setFillColor(colors.darkgreen)
+    pdf.drawString(x, y, 'Payment Details')
+    y -= 16
+
     payment_data = [
         ['Description', 'Amount (₹)'],
         [f"Travel Package: {booking_dict['package_name']}", f"₹{booking_dict['total_price']:,.2f}"],
@@ -1499,66 +1590,47 @@ def generate_invoice(booking_id):
         ['', ''],
         ['TOTAL AMOUNT', f"₹{booking_dict['total_price']:,.2f}"]
     ]
-    
-    payment_table = Table(payment_data, colWidths=[3.5*inch, 1.5*inch])
-    payment_table.setStyle(TableStyle([
-        ('FONT', (0, 0), (-1, -1), 'Helvetica', 10),
-        ('FONT', (0, 0), (-1, 0), 'Helvetica-Bold', 11),
-        ('BACKGROUND', (0, 0), (-1, 0), colors.darkgreen),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-        ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
-        ('LINEABOVE', (0, -1), (-1, -1), 2, colors.black),
-        ('FONT', (0, -1), (-1, -1), 'Helvetica-Bold', 12),
-        ('BACKGROUND', (0, -1), (-1, -1), colors.lightgrey),
-        ('GRID', (0, 0), (-1, -2), 1, colors.grey)
-    ]))
-    story.append(payment_table)
-    story.append(Spacer(1, 30))
-    
+    y = _draw_pdf_rows(pdf, x, y, payment_data, (252, 108),
+                       header_fill=colors.darkgreen, grid_color=colors.grey,
+                       right_align_col=1, total_row=True)
+    y -= 30
+
     # Payment Method and Status
     status_data = [
         ['Payment Method:', booking_dict['payment_method'].title()],
         ['Payment Status:', booking_dict['payment_status']],
         ['Payment Date:', booking_dict['payment_date']]
     ]
-    
-    status_table = Table(status_data, colWidths=[1.5*inch, 4*inch])
-    status_table.setStyle(TableStyle([
-        ('FONT', (0, 0), (-1, -1), 'Helvetica', 10),
-        ('BACKGROUND', (0, 0), (0, -1), colors.lightblue),
-        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-    ]))
-    story.append(status_table)
-    story.append(Spacer(1, 40))
-    
+    y = _draw_pdf_rows(pdf, x, y, status_data, (108, 288),
+                       label_fill=colors.lightblue)
+    y -= 40
+
     # Terms and Conditions
-    terms_style = ParagraphStyle(
-        'TermsStyle',
-        parent=styles['Normal'],
-        fontSize=8,
-        textColor=colors.grey,
-        alignment=1  # Center
-    )
-    story.append(Paragraph("Thank you for choosing ExploreEase!", terms_style))
-    story.append(Paragraph("This is a computer-generated invoice and does not require a signature.", terms_style))
-    story.append(Paragraph("For any queries, contact: support@exploreease.com", terms_style))
-    
-    # Build PDF
-    doc.build(story)
-    
-    # Get PDF value from buffer
-    pdf = buffer.getvalue()
-    buffer.close()
-    
-    # Return PDF as download
-    response = make_response(pdf)
-    response.headers['Content-Type'] = 'application/pdf'
-    response.headers['Content-Disposition'] = f'attachment; filename=invoice_{booking_id}.pdf'
-    return response
+    pdf.setFont('Helvetica', 8)
+    pdf.setFillColor(colors.grey)
+    for line in ('Thank you for choosing ExploreEase!',
+                 'This is a computer-generated invoice and does not require a signature.',
+                 'For any queries, contact: support@exploreease.com'):
+        pdf.drawCentredString(width / 2, y, line)
+        y -= 11
+
+    pdf.showPage()
+    # Emit the PDF on the shared executor
+    _PDF_EXECUTOR.submit(pdf.save).result()
+
+    _store_pdf_cache(cache_path, sink)
+    return send_file(cache_path, mimetype='application/pdf',
+                     as_attachment=True,
+                     download_name=f'invoice_{booking_id}.pdf')
 
 @app.route('/booking/e-ticket/<int:booking_id>')
 @login_required
 def generate_e_ticket(booking_id):
+    # Imported lazily so workers that never serve a PDF skip the several-MB
+    # reportlab import at startup; Python caches the modules after first use
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
     conn = get_db_connection()
     c = conn.cursor()
     
@@ -1568,7 +1640,7 @@ def generate_e_ticket(booking_id):
                  b.total_price, b.status, b.payment_status, b.booking_date,
                  p.name as package_name, p.destination, p.duration, p.image, 
                  p.itinerary, p.inclusions,
-                 u.name as user_name, u.email, u.id as user_id,
+                 u.name as user_name, u.email as user_email,
                  pay.transaction_id, pay.payment_method, pay.created_at as payment_date
                  FROM bookings b 
                  JOIN packages p ON b.package_id = p.id 
@@ -1577,201 +1649,108 @@ def generate_e_ticket(booking_id):
                  WHERE b.id = ? AND b.user_id = ?''', (booking_id, current_user.id))
     
     booking_tuple = c.fetchone()
-    conn.close()
     
     if not booking_tuple:
         flash('Booking not found!', 'error')
         return redirect(url_for('my_bookings'))
     
-    # Convert tuple to dictionary
-    booking_dict = {
-        'id': booking_tuple[0],
-        'user_id': booking_tuple[1],
-        'package_id': booking_tuple[2],
-        'travel_date': safe_format_date(booking_tuple[3]),
-        'guests': booking_tuple[4],
-        'total_price': float(booking_tuple[5]) if booking_tuple[5] else 0.0,
-        'status': booking_tuple[6],
-        'payment_status': booking_tuple[7],
-        'booking_date': safe_format_date(booking_tuple[8]),
-        'package_name': booking_tuple[9],
-        'destination': booking_tuple[10],
-        'duration': booking_tuple[11],
-        'image': booking_tuple[12],
-        'itinerary': booking_tuple[13],
-        'inclusions': booking_tuple[14],
-        'user_name': booking_tuple[15],
-        'user_email': booking_tuple[16],
-        'user_id': booking_tuple[17],
-        'transaction_id': booking_tuple[18],
-        'payment_method': booking_tuple[19],
-        'payment_date': safe_format_date(booking_tuple[20])
-    }
-    
-    # Create PDF buffer
-    buffer = io.BytesIO()
-    
-    # Create PDF document with smaller margins for ticket format
-    doc = SimpleDocTemplate(buffer, pagesize=A4, 
-                          topMargin=0.3*inch, bottomMargin=0.3*inch,
-                          leftMargin=0.3*inch, rightMargin=0.3*inch)
-    
-    story = []
-    styles = getSampleStyleSheet()
-    
-    # Header with company logo and title
-    header_style = ParagraphStyle(
-        'HeaderStyle',
-        parent=styles['Heading1'],
-        fontSize=16,
-        textColor=colors.darkblue,
-        alignment=1,  # Center
-        spaceAfter=20
-    )
-    story.append(Paragraph("EXPLOREEASE TRAVEL E-TICKET", header_style))
-    
-    # Ticket Border - create a table that acts as ticket border
+    booking_dict = dict(booking_tuple)
+    booking_dict['total_price'] = float(booking_dict['total_price'] or 0.0)
+    for date_key in ('travel_date', 'booking_date', 'payment_date'):
+        booking_dict[date_key] = safe_format_date(booking_dict[date_key])
+    
+    # Repeat downloads are served straight off disk; sendfile beats
+    # redoing all the reportlab work for a byte-identical document
+    cache_path = _pdf_cache_path('e_ticket', booking_id, booking_dict)
+    if os.path.exists(cache_path):
+        return send_file(cache_path, mimetype='application/pdf',
+                         as_attachment=True,
+                         download_name=f'e_ticket_{booking_id}.pdf')
+
+    # Fixed one-page ticket layout drawn straight onto a canvas
+    sink = _PdfStream()
+    pdf = canvas.Canvas(sink, pagesize=A4, pageCompression=1)
+    width, height = A4
+    x = 36
+
+    now = datetime.now()
+
+    # Header
+    pdf.setFont('Helvetica-Bold', 16)
+    pdf.setFillColor(colors.darkblue)
+    pdf.drawCentredString(width / 2, height - 50, 'EXPLOREEASE TRAVEL E-TICKET')
+    y = height - 80
+
+    # Ticket reference block
     ticket_data = [
         ['E-TICKET DETAILS', ''],
         ['Booking Reference:', f'BK-{booking_dict["id"]:06d}'],
-        ['Issue Date:', datetime.now().strftime('%Y-%m-%d %H:%M')],
+        ['Issue Date:', now.strftime('%Y-%m-%d %H:%M')],
         ['Status:', booking_dict['status']],
         ['', '']
     ]
-    
-    ticket_table = Table(ticket_data, colWidths=[2.5*inch, 3*inch])
-    ticket_table.setStyle(TableStyle([
-        ('FONT', (0, 0), (-1, -1), 'Helvetica', 10),
-        ('FONT', (0, 0), (-1, 0), 'Helvetica-Bold', 12),
-        ('BACKGROUND', (0, 0), (-1, 0), colors.darkblue),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-        ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-        ('GRID', (0, 0), (-1, -1), 2, colors.darkblue),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-    ]))
-    story.append(ticket_table)
-    story.append(Spacer(1, 20))
-    
-    # Passenger Details
-    passenger_style = ParagraphStyle(
-        'PassengerStyle',
-        parent=styles['Heading2'],
-        fontSize=12,
-        textColor=colors.darkgreen,
-        spaceAfter=10
-    )
-    story.append(Paragraph("PASSENGER INFORMATION", passenger_style))
-    
-    passenger_data = [
-        ['Passenger Name:', booking_dict['user_name']],
-        ['Email:', booking_dict['user_email']],
-        ['User ID:', f'USR-{booking_dict["user_id"]:06d}'],
-        ['Number of Guests:', str(booking_dict['guests'])]
-    ]
-    
-    passenger_table = Table(passenger_data, colWidths=[1.5*inch, 4*inch])
-    passenger_table.setStyle(TableStyle([
-        ('FONT', (0, 0), (-1, -1), 'Helvetica', 10),
-        ('BACKGROUND', (0, 0), (0, -1), colors.lightgreen),
-        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-    ]))
-    story.append(passenger_table)
-    story.append(Spacer(1, 20))
-    
-    # Travel Details
-    travel_style = ParagraphStyle(
-        'TravelStyle',
-        parent=styles['Heading2'],
-        fontSize=12,
-        textColor=colors.purple,
-        spaceAfter=10
-    )
-    story.append(Paragraph("TRAVEL DETAILS", travel_style))
-    
-    travel_data = [
-        ['Package:', booking_dict['package_name']],
-        ['Destination:', booking_dict['destination']],
-        ['Duration:', booking_dict['duration']],
-        ['Travel Date:', booking_dict['travel_date']],
-        ['Booking Date:', booking_dict['booking_date']]
-    ]
-    
-    travel_table = Table(travel_data, colWidths=[1.5*inch, 4*inch])
-    travel_table.setStyle(TableStyle([
-        ('FONT', (0, 0), (-1, -1), 'Helvetica', 10),
-        ('BACKGROUND', (0, 0), (0, -1), colors.lavender),
-        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-    ]))
-    story.append(travel_table)
-    story.append(Spacer(1, 20))
-    
-    # Payment Information
-    payment_style = ParagraphStyle(
-        'PaymentStyle',
-        parent=styles['Heading2'],
-        fontSize=12,
-        textColor=colors.darkred,
-        spaceAfter=10
-    )
-    story.append(Paragraph("PAYMENT INFORMATION", payment_style))
-    
-    payment_data = [
-        ['Total Amount:', f'₹{booking_dict["total_price"]:,.2f}'],
-        ['Payment Method:', booking_dict['payment_method'].title()],
-        ['Transaction ID:', booking_dict['transaction_id'] or 'N/A'],
-        ['Payment Status:', booking_dict['payment_status']],
-        ['Payment Date:', booking_dict['payment_date']]
+    y = _draw_pdf_rows(pdf, x, y, ticket_data, (180, 216),
+                       header_fill=colors.darkblue, grid_color=colors.darkblue)
+    y -= 20
+
+    # Section blocks: heading colour, label-column fill, rows
+    sections = [
+        (colors.darkgreen, colors.lightgreen, 'PASSENGER INFORMATION', [
+            ['Passenger Name:', booking_dict['user_name']],
+            ['Email:', booking_dict['user_email']],
+            ['User ID:', f'USR-{booking_dict["user_id"]:06d}'],
+            ['Number of Guests:', str(booking_dict['guests'])]
+        ]),
+        (colors.purple, colors.lavender, 'TRAVEL DETAILS', [
+            ['Package:', booking_dict['package_name']],
+            ['Destination:', booking_dict['destination']],
+            ['Duration:', booking_dict['duration']],
+            ['Travel Date:', booking_dict['travel_date']],
+            ['Booking Date:', booking_dict['booking_date']]
+        ]),
+        (colors.darkred, colors.mistyrose, 'PAYMENT INFORMATION', [
+            ['Total Amount:', f'₹{booking_dict["total_price"]:,.2f}'],
+            ['Payment Method:', booking_dict['payment_method'].title()],
+            ['Transaction ID:', booking_dict['transaction_id'] or 'N/A'],
+            ['Payment Status:', booking_dict['payment_status']],
+            ['Payment Date:', booking_dict['payment_date']]
+        ]),
     ]
-    
-    payment_table = Table(payment_data, colWidths=[1.5*inch, 4*inch])
-    payment_table.setStyle(TableStyle([
-        ('FONT', (0, 0), (-1, -1), 'Helvetica', 10),
-        ('BACKGROUND', (0, 0), (0, -1), colors.mistyrose),
-        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-    ]))
-    story.append(payment_table)
-    story.append(Spacer(1, 30))
-    
+    for heading_color, label_fill, heading, rows in sections:
+        pdf.setFont('Helvetica-Bold', 12)
+        pdf.setFillColor(heading_color)
+        pdf.drawString(x, y, heading)
+        y -= 14
+        y = _draw_pdf_rows(pdf, x, y, rows, (108, 288), label_fill=label_fill)
+        y -= 20
+
     # Important Notes
-    notes_style = ParagraphStyle(
-        'NotesStyle',
-        parent=styles['Normal'],
-        fontSize=9,
-        textColor=colors.red,
-        alignment=0,  # Left
-        spaceAfter=5
-    )
-    
-    story.append(Paragraph("IMPORTANT NOTES:", notes_style))
-    story.append(Paragraph("• Please carry a printed copy of this e-ticket and valid ID proof.", notes_style))
-    story.append(Paragraph("• Check-in time: 2:00 PM | Check-out time: 11:00 AM", notes_style))
-    story.append(Paragraph("• For any changes, contact us at least 48 hours before travel.", notes_style))
-    story.append(Paragraph("• Emergency contact: +91 9876543210", notes_style))
-    story.append(Spacer(1, 20))
-    
+    pdf.setFont('Helvetica', 9)
+    pdf.setFillColor(colors.red)
+    for line in ('IMPORTANT NOTES:',
+                 '• Please carry a printed copy of this e-ticket and valid ID proof.',
+                 '• Check-in time: 2:00 PM | Check-out time: 11:00 AM',
+                 '• For any changes, contact us at least 48 hours before travel.',
+                 '• Emergency contact: +91 9876543210'):
+        pdf.drawString(x, y, line)
+        y -= 12
+    y -= 10
+
     # Footer
-    footer_style = ParagraphStyle(
-        'FooterStyle',
-        parent=styles['Normal'],
-        fontSize=8,
-        textColor=colors.grey,
-        alignment=1  # Center
-    )
-    story.append(Paragraph("Thank you for choosing ExploreEase! Have a safe journey!", footer_style))
-    story.append(Paragraph("Generated on: " + datetime.now().strftime('%Y-%m-%d %H:%M:%S'), footer_style))
-    
-    # Build PDF
-    doc.build(story)
-    
-    # Get PDF value from buffer
-    pdf = buffer.getvalue()
-    buffer.close()
-    
-    # Return PDF as download
-    response = make_response(pdf)
-    response.headers['Content-Type'] = 'application/pdf'
-    response.headers['Content-Disposition'] = f'attachment; filename=e_ticket_{booking_id}.pdf'
-    return response
+    pdf.setFont('Helvetica', 8)
+    pdf.setFillColor(colors.grey)
+    pdf.drawCentredString(width / 2, y, 'Thank you for choosing ExploreEase! Have a safe journey!')
+    y -= 11
+    pdf.drawCentredString(width / 2, y,
+                          'Generated on: ' + now.strftime('%Y-%m-%d %H:%M:%S'))
+
+    pdf.showPage()
+    _PDF_EXECUTOR.submit(pdf.save).result()
+
+    _store_pdf_cache(cache_path, sink)
+    return send_file(cache_path, mimetype='application/pdf',
+                     as_attachment=True,
+                     download_name=f'e_ticket_{booking_id}.pdf')
 
 @app.route('/my-bookings')
 @login_required
@@ -1785,37 +1764,34 @@ def my_bookings():
                  WHERE b.user_id = ? 
                  ORDER BY b.booking_date DESC''', (current_user.id,))
     bookings = c.fetchall()
-    conn.close()
     return render_template('bookings.html', bookings=bookings)
 
 def safe_format_date(date_value, format='%Y-%m-%d'):
     """
-    Safely format dates for templates, handling various input types
+    Safely format dates for templates, handling various input types.
+    Checks are ordered by frequency: SQLite hands dates back as strings,
+    so that branch returns before any formatting work happens.
     """
     if date_value is None:
         return "N/A"
     
-    # If it's already a string, return as is
     if isinstance(date_value, str):
         return date_value
     
-    # If it's a datetime object, format it
-    if hasattr(date_value, 'strftime'):
+    if isinstance(date_value, (datetime, date)):
         try:
             return date_value.strftime(format)
-        except:
+        except ValueError:
             return str(date_value)
     
-    # If it's a float or int, try to convert to datetime
-    try:
-        from datetime import datetime
-        if isinstance(date_value, (int, float)):
-            # If it's a reasonable timestamp (after 2000)
-            if date_value > 946684800:  # Jan 1, 2000
-                return datetime.fromtimestamp(date_value).strftime(format)
-        return str(date_value)
-    except:
-        return str(date_value)
+    # Epoch timestamps (anything after Jan 1, 2000 is treated as one)
+    if isinstance(date_value, (int, float)) and date_value > 946684800:
+        try:
+            return datetime.fromtimestamp(date_value).strftime(format)
+        except (OverflowError, OSError, ValueError):
+            return str(date_value)
+    
+    return str(date_value)
     
 
 @app.route('/booking/refund/<int:booking_id>', methods=['GET', 'POST'])
@@ -1824,16 +1800,6 @@ def request_refund(booking_id):
     conn = get_db_connection()
     c = conn.cursor()
     
-    # First, ensure the refund_amount column exists
-    try:
-        c.execute("PRAGMA table_info(bookings)")
-        columns = [col[1] for col in c.fetchall()]
-        if 'refund_amount' not in columns:
-            c.execute("ALTER TABLE bookings ADD COLUMN refund_amount REAL DEFAULT 0.0")
-            conn.commit()
-    except Exception as e:
-        print(f"Error ensuring refund_amount column: {e}")
-    
     # Get booking details with proper column selection
     c.execute('''SELECT 
                  b.id, b.user_id, b.package_id, b.travel_date, b.guests, 
@@ -1847,31 +1813,30 @@ def request_refund(booking_id):
     
     if not booking_tuple:
         flash('Booking not found!', 'error')
-        conn.close()
         return redirect(url_for('my_bookings'))
     
-    # Convert tuple to dictionary for template
-    booking_dict = {
-        'id': booking_tuple[0],
-        'user_id': booking_tuple[1],
-        'package_id': booking_tuple[2],
-        'travel_date': safe_format_date(booking_tuple[3]),
-        'guests': booking_tuple[4],
-        'total_price': float(booking_tuple[5]) if booking_tuple[5] else 0.0,
-        'status': booking_tuple[6],
-        'payment_status': booking_tuple[7],
-        'booking_date': safe_format_date(booking_tuple[8]),
-        'package_name': booking_tuple[9],
-        'destination': booking_tuple[10],
-        'duration': booking_tuple[11]
-    }
+    # Rows come back named via the connection's row factory, so the dict
+    # conversion is a single call; only the derived fields need touching up
+    booking_dict = dict(booking_tuple)
+    booking_dict['total_price'] = float(booking_dict['total_price'] or 0.0)
+    for date_key in ('travel_date', 'booking_date'):
+        booking_dict[date_key] = safe_format_date(booking_dict[date_key])
     
     if request.method == 'POST':
         reason = request.form['reason']
         
-        # Calculate refund amount
-        try:
-            travel_date = datetime.strptime(booking_dict['travel_date'], '%Y-%m-%d').date()
+        # Calculate refund amount. The regex guard makes the common
+        # malformed-date case a branch rather than a raised exception;
+        # strptime still backstops out-of-range values like month 13.
+        travel_date = None
+        travel_raw = str(booking_dict['travel_date'] or '')
+        if _DATE_RE.match(travel_raw):
+            try:
+                travel_date = datetime.strptime(travel_raw[:10], '%Y-%m-%d').date()
+            except ValueError:
+                travel_date = None
+        
+        if travel_date is not None:
             days_before = (travel_date - datetime.now().date()).days
             
             if days_before >= 7:
@@ -1880,8 +1845,8 @@ def request_refund(booking_id):
                 refund_amount = booking_dict['total_price'] * 0.5  # 50% refund
             else:
                 refund_amount = 0  # No refund
-        except:
-            # Fallback if date parsing fails
+        else:
+            # Fallback if the stored date is unusable
             refund_amount = booking_dict['total_price'] * 0.5  # Default 50% refund
         
         # Create refund request
@@ -1890,33 +1855,22 @@ def request_refund(booking_id):
                     VALUES (?, ?, ?, ?, 'Pending')''',
                   (booking_id, current_user.id, reason, refund_amount))
         
-        # Update booking status - handle refund_amount column safely
-        try:
-            c.execute('UPDATE bookings SET status = "Cancelled", refund_amount = ? WHERE id = ?',
-                      (refund_amount, booking_id))
-        except sqlite3.OperationalError:
-            # If refund_amount column doesn't exist, update without it
-            c.execute('UPDATE bookings SET status = "Cancelled" WHERE id = ?',
-                      (booking_id,))
+        # refund_amount is guaranteed by the startup migrations
+        c.execute('UPDATE bookings SET status = "Cancelled", refund_amount = ? WHERE id = ?',
+                  (refund_amount, booking_id))
         
         conn.commit()
-        conn.close()
         
         flash('Refund request submitted! We will process it within 3-5 business days.', 'success')
         return redirect(url_for('my_bookings'))
     
-    conn.close()
     return render_template('refund_request.html', booking=booking_dict)
 
 @app.route('/admin/update-schema')
 @login_required
 def update_schema():
     """Manual trigger for schema updates"""
-    if not current_user.is_admin:
-        flash('Access denied!', 'error')
-        return redirect(url_for('index'))
-    
-    update_database_schema()
+    run_migrations()
     flash('Database schema updated successfully!', 'success')
     return redirect(url_for('admin'))
 
@@ -1925,21 +1879,14 @@ def update_schema():
 @app.route('/admin')
 @login_required
 def admin():
-    if not current_user.is_admin:
-        flash('Access denied!', 'error')
-        return redirect(url_for('index'))
-    
     conn = get_db_connection()
     c = conn.cursor()
     
-    c.execute('SELECT COUNT(*) FROM users')
-    user_count = c.fetchone()[0]
-    
-    c.execute('SELECT COUNT(*) FROM bookings')
-    booking_count = c.fetchone()[0]
-    
-    c.execute('SELECT COUNT(*) FROM packages')
-    package_count = c.fetchone()[0]
+    # One statement instead of three cursor round-trips
+    c.execute('''SELECT (SELECT COUNT(*) FROM users),
+                        (SELECT COUNT(*) FROM bookings),
+                        (SELECT COUNT(*) FROM packages)''')
+    user_count, booking_count, package_count = c.fetchone()
     
     # FIXED QUERY - Get proper booking data with correct column mapping
     c.execute('''SELECT 
@@ -1952,7 +1899,6 @@ def admin():
                  ORDER BY b.booking_date DESC LIMIT 10''')
     recent_bookings = c.fetchall()
     
-    conn.close()
     
     return render_template('admin.html', 
                          user_count=user_count,
@@ -1963,25 +1909,16 @@ def admin():
 @app.route('/admin/users')
 @login_required
 def admin_users():
-    if not current_user.is_admin:
-        flash('Access denied!', 'error')
-        return redirect(url_for('index'))
-    
     conn = get_db_connection()
     c = conn.cursor()
     c.execute('SELECT id, name, email, is_admin, created_at FROM users ORDER BY created_at DESC')
     users = c.fetchall()
-    conn.close()
     
     return render_template('admin_users.html', users=users)
 
 @app.route('/admin/user/toggle_admin/<int:user_id>')
 @login_required
 def toggle_user_admin(user_id):
-    if not current_user.is_admin:
-        flash('Access denied!', 'error')
-        return redirect(url_for('index'))
-    
     # Prevent self-demotion
     if user_id == current_user.id:
         flash('You cannot change your own admin status!', 'error')
@@ -2000,129 +1937,102 @@ def toggle_user_admin(user_id):
         flash(f'User {status_text}!', 'success')
     
     conn.commit()
-    conn.close()
     return redirect(url_for('admin_users'))
     
 @app.route('/admin/generate-report')
 @login_required
 def generate_report():
-    if not current_user.is_admin:
-        flash('Access denied!', 'error')
-        return redirect(url_for('index'))
+    # Imported lazily so workers that never serve a PDF skip the several-MB
+    # reportlab import at startup; Python caches the modules after first use
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.units import inch
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table
+    import pdf_styles
     
     try:
-        # Create PDF buffer
-        buffer = io.BytesIO()
+        # Streaming PDF sink
+        sink = _PdfStream()
         
         # Create PDF document
-        doc = SimpleDocTemplate(buffer, pagesize=A4, 
+        doc = SimpleDocTemplate(sink, pagesize=A4, pageCompression=1,
                               topMargin=0.5*inch, bottomMargin=0.5*inch,
                               leftMargin=0.5*inch, rightMargin=0.5*inch)
         
-        # Create story (content)
-        story = []
-        styles = getSampleStyleSheet()
-        
-        # Title
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=18,
-            textColor=colors.darkblue,
-            alignment=1,
-            spaceAfter=30
-        )
-        story.append(Paragraph("ExploreEase Business Report", title_style))
-        story.append(Paragraph(f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M')}", styles['Normal']))
-        story.append(Spacer(1, 20))
-        
-        # Get current stats
+        now = datetime.now()
+
+        # Gather phase: everything bound to the request (DB rows, the
+        # logged-in user) is collected up front, so the render phase below
+        # is free of request-context and connection dependencies
         conn = get_db_connection()
         c = conn.cursor()
-        
-        c.execute('SELECT COUNT(*) FROM users')
-        user_count = c.fetchone()[0]
-        
-        c.execute('SELECT COUNT(*) FROM bookings WHERE status = "Confirmed"')
-        confirmed_bookings = c.fetchone()[0]
-        
-        c.execute('SELECT SUM(total_price) FROM bookings WHERE status = "Confirmed"')
-        total_revenue = c.fetchone()[0] or 0
-        
-        c.execute('SELECT COUNT(*) FROM packages WHERE is_active = TRUE')
-        active_packages = c.fetchone()[0]
-        
-        conn.close()
-        
-        # Statistics Table
-        stats_data = [
-            ['Metric', 'Value'],
-            ['Total Users', str(user_count)],
-            ['Confirmed Bookings', str(confirmed_bookings)],
-            ['Active Packages', str(active_packages)],
-            ['Total Revenue', f'₹{total_revenue:,.2f}'],
-            ['Report Period', 'All Time'],
-            ['Generated By', current_user.name]
-        ]
-        
-        stats_table = Table(stats_data, colWidths=[3*inch, 2*inch])
-        stats_table.setStyle(TableStyle([
-            ('FONT', (0, 0), (-1, -1), 'Helvetica', 10),
-            ('FONT', (0, 0), (-1, 0), 'Helvetica-Bold', 12),
-            ('BACKGROUND', (0, 0), (-1, 0), colors.darkblue),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-            ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-        ]))
-        story.append(stats_table)
-        story.append(Spacer(1, 30))
-        
-        # Recent Activity
-        recent_style = ParagraphStyle(
-            'RecentStyle',
-            parent=styles['Heading2'],
-            fontSize=14,
-            textColor=colors.darkgreen,
-            spaceAfter=10
-        )
-        story.append(Paragraph("Recent Activity Summary", recent_style))
-        
-        activity_text = f"""
-        This report summarizes the current state of the ExploreEase travel platform.
-        The system is operating normally with {user_count} registered users and {active_packages} active travel packages.
-        Total revenue generated: ₹{total_revenue:,.2f}
-        """
-        story.append(Paragraph(activity_text, styles['Normal']))
-        story.append(Spacer(1, 20))
-        
-        # Footer
-        footer_style = ParagraphStyle(
-            'FooterStyle',
-            parent=styles['Normal'],
-            fontSize=8,
-            textColor=colors.grey,
-            alignment=1
-        )
-        story.append(Paragraph("Confidential Business Report - ExploreEase Travel Solutions", footer_style))
-        story.append(Paragraph("123 Travel Street, Kolkata, West Bengal | Phone: +91 9876543210", footer_style))
-        
+
+        # One statement instead of four cursor round-trips
+        c.execute('''SELECT (SELECT COUNT(*) FROM users),
+                            (SELECT COUNT(*) FROM bookings WHERE status = "Confirmed"),
+                            (SELECT SUM(total_price) FROM bookings WHERE status = "Confirmed"),
+                            (SELECT COUNT(*) FROM packages WHERE is_active = TRUE)''')
+        user_count, confirmed_bookings, total_revenue, active_packages = c.fetchone()
+        total_revenue = total_revenue or 0
+        generated_by = current_user.name
+
+        # Render phase: independent sections build their flowables in
+        # parallel on the PDF executor and are stitched back in order
+        def build_header():
+            return [
+                Paragraph("ExploreEase Business Report", pdf_styles.TITLE_STYLE),
+                Paragraph(f"Generated on: {now.strftime('%Y-%m-%d %H:%M')}", pdf_styles.STYLES['Normal']),
+                Spacer(1, 20),
+            ]
+
+        def build_stats_table():
+            stats_data = [
+                ['Metric', 'Value'],
+                ['Total Users', str(user_count)],
+                ['Confirmed Bookings', str(confirmed_bookings)],
+                ['Active Packages', str(active_packages)],
+                ['Total Revenue', f'₹{total_revenue:,.2f}'],
+                ['Report Period', 'All Time'],
+                ['Generated By', generated_by]
+            ]
+            stats_table = Table(stats_data, colWidths=[3*inch, 2*inch])
+            stats_table.setStyle(pdf_styles.STATS_TABLE_STYLE)
+            return [stats_table, Spacer(1, 30)]
+
+        def build_activity():
+            activity_text = f"""
+            This report summarizes the current state of the ExploreEase travel platform.
+            The system is operating normally with {user_count} registered users and {active_packages} active travel packages.
+            Total revenue generated: ₹{total_revenue:,.2f}
+            """
+            return [
+                Paragraph("Recent Activity Summary", pdf_styles.RECENT_STYLE),
+                Paragraph(activity_text, pdf_styles.STYLES['Normal']),
+                Spacer(1, 20),
+            ]
+
+        def build_footer():
+            return [
+                Paragraph("Confidential Business Report - ExploreEase Travel Solutions", pdf_styles.FOOTER_STYLE),
+                Paragraph("123 Travel Street, Kolkata, West Bengal | Phone: +91 9876543210", pdf_styles.FOOTER_STYLE),
+            ]
+
+        sections = [build_header, build_stats_table, build_activity, build_footer]
+        futures = [_PDF_EXECUTOR.submit(section) for section in sections]
+        story = [flowable for future in futures for flowable in future.result()]
+
         # Build PDF
         doc.build(story)
-        
-        # Get PDF value from buffer
-        pdf = buffer.getvalue()
-        buffer.close()
-        
-        # Return PDF as download
-        response = make_response(pdf)
-        response.headers['Content-Type'] = 'application/pdf'
-        response.headers['Content-Disposition'] = f'attachment; filename=exploreease_report_{datetime.now().strftime("%Y%m%d_%H%M")}.pdf'
+
+        # Stream the PDF as a download without a second full-buffer copy
+        response = Response(stream_with_context(sink.chunks()),
+                            mimetype='application/pdf')
+        response.headers['Content-Disposition'] = f'attachment; filename=exploreease_report_{now.strftime("%Y%m%d_%H%M")}.pdf'
         
         flash('Report generated successfully!', 'success')
         return response
         
     except Exception as e:
-        print(f"Error generating report: {e}")
+        logger.error("Error generating report: %s", e)
         flash('Error generating report!', 'error')
         return redirect(url_for('admin'))
     
@@ -2130,81 +2040,79 @@ def generate_report():
 @app.route('/admin/refunds')
 @login_required
 def admin_refunds():
-    if not current_user.is_admin:
-        flash('Access denied!', 'error')
-        return redirect(url_for('index'))
-    
     conn = get_db_connection()
     c = conn.cursor()
-    c.execute('''SELECT rr.*, u.name as user_name, p.name as package_name, b.total_price
+    # Numeric coercion happens in SQL; no per-row Python post-processing
+    c.execute('''SELECT rr.id, rr.booking_id, rr.user_id, rr.reason,
+                        CAST(rr.refund_amount AS REAL) as refund_amount,
+                        rr.status, rr.requested_at, rr.processed_at,
+                        u.name as user_name, p.name as package_name,
+                        CAST(b.total_price AS REAL) as total_price
                  FROM refund_requests rr
                  JOIN users u ON rr.user_id = u.id
                  JOIN bookings b ON rr.booking_id = b.id
                  JOIN packages p ON b.package_id = p.id
                  ORDER BY rr.requested_at DESC''')
-    refund_requests_raw = c.fetchall()
-    conn.close()
-    
-    # Convert numeric values to proper types
-    refund_requests = []
-    for request in refund_requests_raw:
-        request_list = list(request)
-        # Convert refund_amount (index 4) and total_price (index 9) to float
-        if request_list[4] is not None:  # refund_amount
-            request_list[4] = float(request_list[4]) if str(request_list[4]).replace('.', '').isdigit() else 0.0
-        if request_list[9] is not None:  # total_price
-            request_list[9] = float(request_list[9]) if str(request_list[9]).replace('.', '').isdigit() else 0.0
-        refund_requests.append(tuple(request_list))
+    refund_requests = c.fetchall()
     
     return render_template('admin_refunds.html', refund_requests=refund_requests)
 
 @app.route('/admin/refund/process/<int:refund_id>/<action>')
 @login_required
 def process_refund(refund_id, action):
-    if not current_user.is_admin:
-        flash('Access denied!', 'error')
-        return redirect(url_for('index'))
-    
-    conn = get_db_connection()
-    c = conn.cursor()
-    
     if action == 'approve':
-        c.execute('''UPDATE refund_requests SET status = 'Approved', processed_at = CURRENT_TIMESTAMP 
-                     WHERE id = ?''', (refund_id,))
-        # Update booking and payment status
-        c.execute('''UPDATE bookings SET payment_status = 'Refunded' 
-                     WHERE id = (SELECT booking_id FROM refund_requests WHERE id = ?)''', (refund_id,))
+        # Both UPDATEs ride one write transaction with a single commit
+        with write_conn() as conn:
+            conn.execute('''UPDATE refund_requests SET status = 'Approved', processed_at = CURRENT_TIMESTAMP 
+                            WHERE id = ?''', (refund_id,))
+            conn.execute('''UPDATE bookings SET payment_status = 'Refunded' 
+                            WHERE id = (SELECT booking_id FROM refund_requests WHERE id = ?)''', (refund_id,))
         flash('Refund approved and processed!', 'success')
     elif action == 'reject':
-        c.execute('''UPDATE refund_requests SET status = 'Rejected', processed_at = CURRENT_TIMESTAMP 
-                     WHERE id = ?''', (refund_id,))
+        with write_conn() as conn:
+            conn.execute('''UPDATE refund_requests SET status = 'Rejected', processed_at = CURRENT_TIMESTAMP 
+                            WHERE id = ?''', (refund_id,))
         flash('Refund request rejected!', 'success')
     
-    conn.commit()
-    conn.close()
     return redirect(url_for('admin_refunds'))
 
+# Comparison IN (...) SQL cached per id count; the connection's own
+# statement cache then reuses the prepared form of each query shape.
+# The id cap bounds both the cache and the cost of hostile URLs.
+_COMPARE_MAX_IDS = 10
+_COMPARE_SQLS = {}
+
+
+def _compare_sql(n):
+    sql = _COMPARE_SQLS.get(n)
+    if sql is None:
+        placeholders = ','.join('?' * n)
+        sql = _COMPARE_SQLS.setdefault(
+            n, f'SELECT * FROM packages WHERE id IN ({placeholders}) AND is_active = TRUE')
+    return sql
+
+
 # Package comparison
 @app.route('/compare')
 def compare_packages():
-    # Get package IDs from URL parameters
+    # Pull numeric ids out of either parameter style with one precompiled
+    # regex; str.isdigit() alone accepts things int() rejects ('²', etc.)
     package_ids_param = request.args.get('package_ids')
     if package_ids_param:
-        package_ids = [int(pid) for pid in package_ids_param.split(',') if pid.isdigit()]
+        package_ids = [int(m.group()) for m in _ID_RE.finditer(package_ids_param)]
     else:
         # Fallback to individual package_id parameters
-        package_ids = [int(pid) for pid in request.args.getlist('package_id') if pid.isdigit()]
+        package_ids = [int(pid) for pid in request.args.getlist('package_id')
+                       if _ID_RE.fullmatch(pid)]
     
     packages = []
+    package_ids = package_ids[:_COMPARE_MAX_IDS]
     
     if package_ids:
         conn = get_db_connection()
         c = conn.cursor()
-        placeholders = ','.join('?' * len(package_ids))
-        query = f'SELECT * FROM packages WHERE id IN ({placeholders}) AND is_active = TRUE'
-        c.execute(query, package_ids)
+        c.execute(_compare_sql(len(package_ids)), package_ids)
         packages = c.fetchall()
-        conn.close()
     
     return render_template('compare.html', packages=packages)
 
@@ -2222,18 +2130,19 @@ def test_payment(booking_id):
     test_amount = 1000.50
     payment_method = "test"
     
-    print(f"TEST: Testing payment creation for booking {booking_id}")
-    payment_id = create_payment_simple(booking_id, current_user.id, test_amount, payment_method)
+    logger.debug("Testing payment creation for booking %s", booking_id)
+    payment_id = create_payment(booking_id, current_user.id, test_amount, payment_method)
     
     if payment_id:
         return jsonify({"success": True, "payment_id": payment_id})
     else:
         return jsonify({"success": False, "error": "Payment creation failed"})
 
+# Compile every template once at import so cold workers serve their first
+# render from the bytecode cache instead of compiling on demand
+for _template_name in app.jinja_env.list_templates(extensions=('html',)):
+    app.jinja_env.get_template(_template_name)
+
 if __name__ == '__main__':
-    # Create upload folder if it doesn't exist
-    if not os.path.exists(app.config['UPLOAD_FOLDER']):
-        os.makedirs(app.config['UPLOAD_FOLDER'])
-    
     port = int(os.environ.get('PORT', 10000))
     app.run(host='0.0.0.0', port=port, debug=False)
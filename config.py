@@ -1,6 +1,24 @@
 import os
 
+# One walk over the environment block at import; every setting below reads
+# from this dict instead of paying a fresh os.environ lookup per key
+_ENV = os.environ.copy()
+
+
 class Config:
-    SECRET_KEY = os.environ.get('SECRET_KEY') or 'exploreease-secret-key-2025'
-    ADMIN_SECRET_KEY = os.environ.get('ADMIN_SECRET_KEY') or 'admin123'
+    """App settings; Config() always hands back the same shared instance"""
+
+    SECRET_KEY = _ENV.get('SECRET_KEY', 'exploreease-secret-key-2025')
+    ADMIN_SECRET_KEY = _ENV.get('ADMIN_SECRET_KEY', 'admin123')
     UPLOAD_FOLDER = 'static/uploads'
+
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+        return cls._instance
+
+
+# Canonical instance for call sites that want an object rather than the class
+config = Config()
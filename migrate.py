@@ -0,0 +1,95 @@
+"""
+One-shot schema migrations for the ExploreEase database.
+
+Run manually (``python migrate.py``) or as a pre-deploy hook. The checks are
+gated on ``PRAGMA user_version`` so an already-migrated database skips all
+of the table inspection work.
+"""
+import logging
+import os
+import sqlite3
+
+logger = logging.getLogger(__name__)
+
+# Bump this when adding a new migration step below
+SCHEMA_VERSION = 1
+
+
+def _db_path():
+    """Resolve the database location (local path or Render persistent disk)"""
+    if 'RENDER' in os.environ:
+        os.makedirs('/opt/render/data', exist_ok=True)
+        return '/opt/render/data/database.db'
+    return 'database.db'
+
+
+def _connect():
+    conn = sqlite3.connect(_db_path(), timeout=10)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def update_database_schema(conn):
+    """Add columns that older bookings tables are missing"""
+    c = conn.cursor()
+    c.execute("PRAGMA table_info(bookings)")
+    columns = [col[1] for col in c.fetchall()]
+
+    missing_columns = [
+        ('booking_date', 'DATETIME DEFAULT CURRENT_TIMESTAMP'),
+        ('travel_date', 'DATETIME'),
+        ('refund_amount', 'REAL DEFAULT 0.0')
+    ]
+
+    for column_name, column_type in missing_columns:
+        if column_name not in columns:
+            logger.info("Adding %s column to bookings table...", column_name)
+            c.execute(f"ALTER TABLE bookings ADD COLUMN {column_name} {column_type}")
+
+
+def verify_and_fix_payments_table(conn):
+    """Add columns that older payments tables are missing"""
+    c = conn.cursor()
+    c.execute("PRAGMA table_info(payments)")
+    column_names = [col[1] for col in c.fetchall()]
+
+    required_columns = ['id', 'booking_id', 'user_id', 'amount', 'payment_method',
+                        'status', 'transaction_id', 'payment_date', 'created_at']
+
+    for req_col in required_columns:
+        if req_col not in column_names:
+            logger.info("Adding missing payments column: %s", req_col)
+            if req_col == 'amount':
+                c.execute(f"ALTER TABLE payments ADD COLUMN {req_col} REAL NOT NULL DEFAULT 0.0")
+            elif req_col in ['payment_date', 'created_at']:
+                c.execute(f"ALTER TABLE payments ADD COLUMN {req_col} DATETIME DEFAULT CURRENT_TIMESTAMP")
+            else:
+                c.execute(f"ALTER TABLE payments ADD COLUMN {req_col} TEXT")
+
+
+def run_migrations(conn=None):
+    """Apply pending migrations; a no-op once user_version is current"""
+    own_conn = conn is None
+    if own_conn:
+        conn = _connect()
+    try:
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if version >= SCHEMA_VERSION:
+            return
+
+        update_database_schema(conn)
+        verify_and_fix_payments_table(conn)
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        conn.commit()
+        logger.info("Database migrated to schema version %s", SCHEMA_VERSION)
+    except Exception as e:
+        logger.error("Error running migrations: %s", e)
+        conn.rollback()
+    finally:
+        if own_conn:
+            conn.close()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    run_migrations()
@@ -0,0 +1,50 @@
+"""
+Shared ReportLab styles for the PDF routes.
+
+Building a style registry is allocation-heavy, so the stylesheet and the
+named ParagraphStyles live at module scope and are constructed exactly once
+per process. The module itself is imported lazily from the PDF views, so
+workers that never serve a PDF still skip the reportlab import entirely.
+"""
+from reportlab.lib import colors
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.platypus import TableStyle
+
+STYLES = getSampleStyleSheet()
+
+TITLE_STYLE = ParagraphStyle(
+    'CustomTitle',
+    parent=STYLES['Heading1'],
+    fontSize=18,
+    textColor=colors.darkblue,
+    alignment=1,  # Center
+    spaceAfter=30
+)
+
+FOOTER_STYLE = ParagraphStyle(
+    'FooterStyle',
+    parent=STYLES['Normal'],
+    fontSize=8,
+    textColor=colors.grey,
+    alignment=1  # Center
+)
+
+RECENT_STYLE = ParagraphStyle(
+    'RecentStyle',
+    parent=STYLES['Heading2'],
+    fontSize=14,
+    textColor=colors.darkgreen,
+    spaceAfter=10
+)
+
+
+# Static table style shared by the report route; TableStyle is immutable
+# after construction, so one instance per layout serves every request
+STATS_TABLE_STYLE = TableStyle([
+    ('FONT', (0, 0), (-1, -1), 'Helvetica', 10),
+    ('FONT', (0, 0), (-1, 0), 'Helvetica-Bold', 12),
+    ('BACKGROUND', (0, 0), (-1, 0), colors.darkblue),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+    ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black)
+])